@@ -0,0 +1,139 @@
+import os
+import zlib
+from typing import Callable, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional; without it responses are gzip-compressed only
+    brotli = None
+
+# Smallest body worth compressing; below this the framing overhead eats the saving
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Bodies at least this large are compressed in the sync executor instead of on the event loop
+COMPRESSION_THREAD_MIN_SIZE = int(os.getenv("COMPRESSION_THREAD_MIN_SIZE", str(256 * 1024)))
+# Fast levels: a 20 MB order history still shrinks 7-8x, for a fraction of the CPU time of higher ones
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "3"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "1"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    The best encoding we support that the client accepts ("br", then "gzip"), or None.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def _compressor(encoding: str) -> Callable[[bytes, bool], bytes]:
+    """
+    Incremental compressor: call with each chunk and whether it is the last. Every call returns
+    all the output produced so far, so each chunk of a streamed response reaches the client
+    without waiting for the next one.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+        def compress(data: bytes, last: bool) -> bytes:
+            return compressor.process(data) + (compressor.finish() if last else compressor.flush())
+    else:
+        # wbits=31 writes the gzip container
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+        def compress(data: bytes, last: bool) -> bytes:
+            return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compress
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that brotli- or gzip-compresses JSON, NDJSON and text responses.
+
+    Complete responses smaller than COMPRESSION_MIN_SIZE go out as they are, and large ones are
+    compressed in the sync executor so a multi-megabyte order history does not stall other
+    requests. Streamed responses are compressed chunk by chunk and flushed after each one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compress = None
+
+        async def send_wrapper(message):
+            nonlocal start, compress
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compress is None:
+                headers = start["headers"]
+                content_type = b""
+                encoded = False
+                for name, value in headers:
+                    if name == b"content-type":
+                        content_type = value
+                    elif name == b"content-encoding":
+                        encoded = True
+                compressible = (
+                    not encoded
+                    and start["status"] not in (204, 304)
+                    and content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= COMPRESSION_MIN_SIZE)
+                )
+                if not compressible:
+                    await send(start)
+                    start = None
+                    return await send(message)
+
+                compress = _compressor(encoding)
+                if more_body:
+                    body = compress(body, False)
+                elif len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                    from app.services.binance import BinanceService
+
+                    body = await BinanceService.run_sync(compress, body, True)
+                else:
+                    body = compress(body, True)
+                headers = [(name, value) for name, value in headers if name != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start, "headers": headers})
+                return await send({**message, "body": body})
+
+            await send({**message, "body": compress(body, not more_body)})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class AssetInfo(BaseModel):
@@ -168,14 +168,16 @@ class FuturesOrder(BaseModel):
     updateTime: int
     timeReadable: str
     updateTimeReadable: str
-    realizedPnl: str
-    commission: str
-    commissionAsset: str
+    # Only set for orders with fills
+    realizedPnl: Optional[str] = None
+    commission: Optional[str] = None
+    commissionAsset: Optional[str] = None
 
 class FuturesOrdersResponse(BaseModel):
     total_orders: int
     period: str
     orders: List[FuturesOrder]
+    note: Optional[str] = None
 
     class Config:
         json_schema_extra = {
@@ -247,4 +249,25 @@ class FuturesOrdersResponse(BaseModel):
                     }
                 ]
             }
-        } 
\ No newline at end of file
+        } 
+
+class SymbolInfo(BaseModel):
+    symbol: str
+    status: str
+    contractType: str
+    pricePrecision: int
+    quantityPrecision: int
+    baseAsset: str
+    quoteAsset: str
+    marginAsset: str
+    filters: Dict[str, Dict[str, Any]]
+
+class LeverageChange(BaseModel):
+    symbol: str
+    leverage: int
+
+class PortfolioAccount(BaseModel):
+    # The caller's own API key pair; the server never looks up credentials on anyone's behalf
+    api_key: str
+    api_secret: str
+    label: Optional[str] = None
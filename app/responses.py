@@ -0,0 +1,99 @@
+import os
+import typing
+from fastapi.responses import Response, UJSONResponse
+from pydantic import BaseModel
+from typing import Any, Dict, Optional, Tuple, Type
+
+# Validate route payloads against their response models before sending (off: trust upstream payloads)
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "false").lower() == "true"
+
+# Marks a model field with no default, which is left out when the payload lacks it
+_REQUIRED = object()
+
+# Per model: (name, container, nested model, default) for each field, in declaration order
+_SHAPES: Dict[type, Tuple[Tuple[str, Optional[type], Optional[type], Any], ...]] = {}
+
+
+def _nested_model(annotation) -> Tuple[Optional[type], Optional[type]]:
+    """
+    (container, model) for a field holding a model, a List of them or a Dict of them; (None, None) otherwise.
+    """
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if origin is typing.Union and len(args) == 1:
+        return _nested_model(args[0])
+    if origin in (list, dict) and args and isinstance(args[-1], type) and issubclass(args[-1], BaseModel):
+        return origin, args[-1]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return None, annotation
+    return None, None
+
+
+def _shape(model: Type[BaseModel]):
+    shape = _SHAPES.get(model)
+    if shape is None:
+        fields = []
+        for name, field in model.model_fields.items():
+            container, nested = _nested_model(field.annotation)
+            default = _REQUIRED if field.is_required() else field.get_default(call_default_factory=True)
+            fields.append((name, container, nested, default))
+        shape = _SHAPES[model] = tuple(fields)
+    return shape
+
+
+def model_fields_only(content: Any, model: Type[BaseModel]) -> Any:
+    """
+    `content` cut down to the fields `model` declares, recursively and in declaration order, with
+    defaults filled in for optional fields it lacks: the keys pydantic would dump, without
+    validating or converting any values.
+    """
+    if not isinstance(content, dict):
+        return content
+    projected = {}
+    for name, container, nested, default in _shape(model):
+        value = content.get(name, _REQUIRED)
+        if value is _REQUIRED:
+            if default is not _REQUIRED:
+                projected[name] = default
+            continue
+        if nested is not None and value is not None:
+            if container is list:
+                value = [model_fields_only(item, nested) for item in value]
+            elif container is dict:
+                value = {key: model_fields_only(item, nested) for key, item in value.items()}
+            else:
+                value = model_fields_only(value, nested)
+        projected[name] = value
+    return projected
+
+
+def fast_json_response(content: Any, model: Type[BaseModel]) -> Response:
+    """
+    Serialize a route result without FastAPI's response_model validate-and-re-encode round trip.
+
+    Payloads built from Binance responses are trusted: they are cut down to the fields of `model`
+    and written straight out with ujson. With VALIDATE_RESPONSES enabled, the payload is instead
+    validated against `model` exactly once and dumped to JSON by pydantic-core. Either way the
+    response carries the same fields. Error payloads are passed through unvalidated.
+    """
+    if "error" in content:
+        return UJSONResponse(content)
+    if VALIDATE_RESPONSES:
+        return Response(model.model_validate(content).model_dump_json(), media_type="application/json")
+    return UJSONResponse(model_fields_only(content, model))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`, using the weak comparison RFC 9110 prescribes for it.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
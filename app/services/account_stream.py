@@ -0,0 +1,428 @@
+import asyncio
+import os
+import time
+import ujson
+import websockets
+from typing import Dict, List, Optional, Set
+from app.services.client_pool import credential_key, get_client_pool
+from app.services.shared_cache import get_shared_cache
+
+FUTURES_STREAM_URL = "wss://fstream.binance.com/ws/"
+
+# Pending pushes per subscriber before it is considered too slow and re-sent a full snapshot
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def filter_account(account_info: dict) -> dict:
+    """
+    Dashboard view of a futures account: only assets that were ever used and positions holding margin.
+    """
+    account_info = dict(account_info)
+    account_info["assets"] = [asset for asset in account_info["assets"] if asset["updateTime"] > 0]
+    account_info["positions"] = [position for position in account_info["positions"] if float(position["initialMargin"]) > 0]
+    return account_info
+
+
+def _copy_view(view: dict) -> dict:
+    view = dict(view)
+    view["assets"] = [dict(asset) for asset in view["assets"]]
+    view["positions"] = [dict(position) for position in view["positions"]]
+    return view
+
+
+def _diff_rows(old: List[dict], new: List[dict], key) -> tuple:
+    old_rows = {key(row): row for row in old}
+    new_rows = {key(row): row for row in new}
+    changed = [row for row_key, row in new_rows.items() if old_rows.get(row_key) != row]
+    removed = [row_key for row_key in old_rows if row_key not in new_rows]
+    return changed, removed
+
+
+def diff_account(old: dict, new: dict) -> dict:
+    """
+    Changes between two filtered account views, or an empty dict when nothing changed.
+    """
+    delta = {}
+    account = {k: v for k, v in new.items() if k not in ("assets", "positions") and old.get(k) != v}
+    if account:
+        delta["account"] = account
+    assets, removed_assets = _diff_rows(old["assets"], new["assets"], lambda a: a["asset"])
+    if assets:
+        delta["assets"] = assets
+    if removed_assets:
+        delta["removedAssets"] = removed_assets
+    positions, removed_positions = _diff_rows(
+        old["positions"], new["positions"], lambda p: (p["symbol"], p["positionSide"])
+    )
+    if positions:
+        delta["positions"] = positions
+    if removed_positions:
+        delta["removedPositions"] = [{"symbol": symbol, "positionSide": side} for symbol, side in removed_positions]
+    return delta
+
+
+class AccountStream:
+    """
+    In-memory futures account for one credential, kept current by the user-data WebSocket stream.
+
+    The account starts from a REST `futures_account()` snapshot in the same shape the REST
+    endpoint returns. ACCOUNT_UPDATE events patch balances and positions in place, and
+    ACCOUNT_CONFIG_UPDATE events patch leverage. Fields the stream does not carry (margins,
+    notional) are refreshed by a REST reconcile that runs periodically, and after events that
+    change positions, orders or leverage, though no more than once per `min_reconcile_interval`.
+    A gap in the stream (a reconnect, or an update for an asset or position the snapshot does
+    not have) is reconciled right away.
+
+    Changes made through this service (`invalidate`, or an invalidation the shared cache reports
+    from another worker) mark the snapshot stale: the next read waits for a fresh one.
+
+    Subscribers (dashboard push connections) share the stream. After every change the filtered
+    account is diffed once against what was last published, and the same delta message is
+    queued for every subscriber, along with a message per fill.
+    """
+
+    def __init__(self, api_key: str, api_secret: str, reconcile_interval: float = 60.0,
+                 reconcile_debounce: float = 1.0, min_reconcile_interval: float = 15.0,
+                 keepalive_interval: float = 1800.0):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.key = credential_key(api_key, api_secret)
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_debounce = reconcile_debounce
+        self.min_reconcile_interval = min_reconcile_interval
+        self.keepalive_interval = keepalive_interval
+        self.account: Optional[dict] = None
+        self.last_read = time.monotonic()
+        self.last_event = 0.0
+        self._last_reconcile = 0.0
+        self._stale = False
+        # Shared-cache invalidation count as of the last reconcile
+        self._generation: Optional[int] = None
+        self._snapshot_lock = asyncio.Lock()
+        self._tasks = []
+        self._reconcile_requested = asyncio.Event()
+        self._gap = asyncio.Event()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._published: Optional[dict] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if not self._subscribers and self.account is not None:
+            self._published = _copy_view(filter_account(self.account))
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        self.last_read = time.monotonic()
+        if not self._subscribers:
+            self._published = None
+
+    def _publish(self, message: dict):
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for deltas to be useful; start the subscriber over from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "snapshot", "account": filter_account(self.account)})
+
+    def _changed(self):
+        if self.account is None:
+            return
+        # NumPy-backed, so imported on first use rather than at startup
+        from app.services.live_pnl import get_live_pnl
+
+        live_pnl = get_live_pnl()
+        if live_pnl.is_tracked(self.key):
+            live_pnl.update_account(self.key, self.account)
+        if not self._subscribers:
+            return
+        view = filter_account(self.account)
+        if self._published is None:
+            self._published = _copy_view(view)
+            return
+        delta = diff_account(self._published, view)
+        if delta:
+            self._published = _copy_view(view)
+            self._publish({"type": "delta", **delta})
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._reconcile_loop()),
+            asyncio.create_task(self._stream_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        from app.services.live_pnl import get_live_pnl
+
+        get_live_pnl().untrack(self.key)
+
+    async def snapshot(self) -> dict:
+        self.last_read = time.monotonic()
+        generation = self._shared_generation()
+        if generation is not None and self._generation is not None and generation != self._generation:
+            # Another worker changed the account
+            self._stale = True
+        if self.account is None or self._stale:
+            # The first read waits for the initial REST snapshot and surfaces its errors
+            async with self._snapshot_lock:
+                if self.account is None or self._stale:
+                    await self._reconcile()
+        return self.account
+
+    def invalidate(self):
+        """
+        Mark the snapshot stale after a change made through this service (leverage, position mode).
+        """
+        self._stale = True
+        self._request_reconcile(gap=True)
+
+    def _shared_generation(self) -> Optional[int]:
+        shared_cache = get_shared_cache()
+        if shared_cache is None:
+            return None
+        generation = shared_cache.generation(self.key)
+        # -1: the shared cache is busy, which says nothing about the account
+        return generation if generation >= 0 else None
+
+    def _request_reconcile(self, gap: bool = False):
+        if gap:
+            self._gap.set()
+        self._reconcile_requested.set()
+
+    async def _reconcile(self):
+        self._last_reconcile = time.monotonic()
+        # Cleared before the call, so an invalidation that arrives during it is not lost
+        stale, self._stale = self._stale, False
+        generation = self._shared_generation()
+        try:
+            async with get_client_pool().client(self.api_key, self.api_secret) as client:
+                self.account = await client.futures_account()
+        except Exception:
+            self._stale = self._stale or stale
+            raise
+        self._generation = generation
+        self._changed()
+
+    async def _reconcile_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._reconcile_requested.wait(), self.reconcile_interval)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                # Routine requests wait out the minimum interval, unless a gap turns up meanwhile
+                wait = self._last_reconcile + self.min_reconcile_interval - time.monotonic()
+                if wait > 0 and not self._gap.is_set():
+                    try:
+                        await asyncio.wait_for(self._gap.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                # Let a burst of events settle before paying for the REST call
+                await asyncio.sleep(self.reconcile_debounce)
+            self._reconcile_requested.clear()
+            self._gap.clear()
+            try:
+                await self._reconcile()
+            except Exception as e:
+                print(f"Error reconciling account snapshot: {str(e)}")
+
+    async def _keepalive(self, listen_key: str):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            async with get_client_pool().client(self.api_key, self.api_secret) as client:
+                await client.futures_stream_keepalive(listen_key)
+
+    async def _stream_loop(self):
+        backoff = 1
+        connected_before = False
+        while True:
+            keepalive = None
+            try:
+                async with get_client_pool().client(self.api_key, self.api_secret) as client:
+                    listen_key = await client.futures_stream_get_listen_key()
+                keepalive = asyncio.create_task(self._keepalive(listen_key))
+                async with websockets.connect(FUTURES_STREAM_URL + listen_key) as ws:
+                    backoff = 1
+                    if connected_before:
+                        # Events may have been missed while disconnected
+                        self._request_reconcile(gap=True)
+                    connected_before = True
+                    async for message in ws:
+                        event = ujson.loads(message)
+                        if event.get("e") == "listenKeyExpired":
+                            break
+                        self.apply_event(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in account stream: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if keepalive is not None:
+                    keepalive.cancel()
+
+    def apply_event(self, event: dict):
+        if self.account is None:
+            return
+        self.last_event = time.monotonic()
+        if event.get("e") == "ACCOUNT_UPDATE":
+            self._apply_account_update(event)
+            self._changed()
+        elif event.get("e") == "ACCOUNT_CONFIG_UPDATE":
+            self._apply_config_update(event)
+            self._changed()
+        elif event.get("e") == "ORDER_TRADE_UPDATE":
+            # Open orders change margin requirements, which only the REST snapshot reports
+            self._request_reconcile()
+            order = event["o"]
+            if order.get("x") == "TRADE" and self._subscribers:
+                self._publish({"type": "fill", "fill": {
+                    "symbol": order["s"],
+                    "orderId": order["i"],
+                    "tradeId": order["t"],
+                    "side": order["S"],
+                    "positionSide": order["ps"],
+                    "price": order["L"],
+                    "qty": order["l"],
+                    "realizedPnl": order["rp"],
+                    "commission": order.get("n", "0"),
+                    "commissionAsset": order.get("N"),
+                    "orderStatus": order["X"],
+                    "time": order["T"],
+                }})
+
+    def _apply_account_update(self, event: dict):
+        update = event["a"]
+        self.account["updateTime"] = event["E"]
+
+        assets = {asset["asset"]: asset for asset in self.account["assets"]}
+        for balance in update.get("B", []):
+            asset = assets.get(balance["a"])
+            if asset is None:
+                self._request_reconcile(gap=True)
+                continue
+            asset["walletBalance"] = balance["wb"]
+            asset["crossWalletBalance"] = balance["cw"]
+            asset["updateTime"] = event["E"]
+
+        positions = {(p["symbol"], p["positionSide"]): p for p in self.account["positions"]}
+        for update_position in update.get("P", []):
+            position = positions.get((update_position["s"], update_position["ps"]))
+            if position is None:
+                self._request_reconcile(gap=True)
+                continue
+            if position["positionAmt"] != update_position["pa"]:
+                # Opened, closed or resized: margins and notional need a fresh snapshot
+                self._request_reconcile()
+            position["positionAmt"] = update_position["pa"]
+            position["entryPrice"] = update_position["ep"]
+            position["breakEvenPrice"] = update_position.get("bep", position["breakEvenPrice"])
+            position["unrealizedProfit"] = update_position["up"]
+            position["isolated"] = update_position["mt"] == "isolated"
+            position["isolatedWallet"] = update_position["iw"]
+            position["updateTime"] = event["E"]
+
+    def _apply_config_update(self, event: dict):
+        config = event.get("ac")
+        if config is None:
+            # Multi-assets mode ("ai") changes margin figures only the REST snapshot has
+            self._request_reconcile(gap=True)
+            return
+        positions = [p for p in self.account["positions"] if p["symbol"] == config["s"]]
+        if not positions:
+            self._request_reconcile(gap=True)
+            return
+        for position in positions:
+            position["leverage"] = str(config["l"])
+        # Leverage moves initial margin and the notional cap, which only the REST snapshot reports
+        self._request_reconcile()
+
+
+class AccountStreamManager:
+    """
+    One AccountStream per active credential, stopped after `idle_ttl` seconds without reads or subscribers.
+
+    Idle streams are swept by a background task (see `start`), so they are stopped even when no
+    further requests come in, instead of holding a WebSocket and spending request weight on
+    keepalives and reconciles with nobody reading.
+    """
+
+    def __init__(self, idle_ttl: float = 600.0, **stream_options):
+        self.idle_ttl = idle_ttl
+        self.stream_options = stream_options
+        self._streams: Dict[str, AccountStream] = {}
+        self._lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(min(self.idle_ttl / 2, 60.0))
+            try:
+                async with self._lock:
+                    await self._evict_idle()
+            except Exception as e:
+                print(f"Error sweeping idle account streams: {str(e)}")
+
+    async def get(self, api_key: str, api_secret: str) -> AccountStream:
+        key = credential_key(api_key, api_secret)
+        async with self._lock:
+            await self._evict_idle()
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = AccountStream(api_key, api_secret, **self.stream_options)
+                await stream.start()
+        return stream
+
+    def invalidate(self, api_key: str, api_secret: str):
+        """
+        Mark the credential's stream, if there is one, stale after a change made through this service.
+        """
+        stream = self._streams.get(credential_key(api_key, api_secret))
+        if stream is not None:
+            stream.invalidate()
+
+    async def _evict_idle(self):
+        now = time.monotonic()
+        for key, stream in list(self._streams.items()):
+            if not stream.subscriber_count and now - stream.last_read > self.idle_ttl:
+                await self._streams.pop(key).stop()
+
+    async def close_all(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        async with self._lock:
+            while self._streams:
+                _, stream = self._streams.popitem()
+                await stream.stop()
+
+
+ACCOUNT_STREAM_ENABLED = os.getenv("ACCOUNT_STREAM_ENABLED", "false").lower() == "true"
+
+_manager: Optional[AccountStreamManager] = None
+
+
+def get_account_streams() -> AccountStreamManager:
+    global _manager
+    if _manager is None:
+        _manager = AccountStreamManager(
+            idle_ttl=float(os.getenv("ACCOUNT_STREAM_IDLE_TTL", "600")),
+            reconcile_interval=float(os.getenv("ACCOUNT_STREAM_RECONCILE_INTERVAL", "60")),
+            min_reconcile_interval=float(os.getenv("ACCOUNT_STREAM_MIN_RECONCILE_INTERVAL", "15")),
+        )
+    return _manager
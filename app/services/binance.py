@@ -1,27 +1,207 @@
-from binance import Client
+import asyncio
+import functools
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, AsyncIterator, Callable, List, Set, Tuple
+from app.models.futures import LeverageChange, PortfolioAccount
+from app.responses import etag_matches
+from app.services.account_stream import ACCOUNT_STREAM_ENABLED, filter_account, get_account_streams
+from app.services.client_pool import credential_key, get_client_pool
+from app.services.exchange_info import get_exchange_info_cache
+from app.services.leverage_brackets import BracketTable, index_brackets
+from app.services.metrics import HISTORY_WINDOW_RETRIES, HISTORY_WINDOWS
+from app.services.order_store import ALL_SYMBOLS, ORDER_STORE_ENABLED, OrderStore, get_order_store
+from app.services.portfolio import aggregate_accounts
+from app.services.request_cache import get_request_cache, shared_key
+from app.services.shared_cache import get_shared_cache
+
+if TYPE_CHECKING:
+    from binance import AsyncClient
+    from app.services.order_columns import OrderColumns
+
+# Bounded pool for blocking work that has no async equivalent
+_sync_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BINANCE_SYNC_WORKERS", "8")),
+    thread_name_prefix="binance-sync",
+)
+
+# Binance caps allOrders/userTrades queries at 7 days per request
+HISTORY_WINDOW_MS = 7 * 24 * 60 * 60 * 1000
+# Binance only serves order history for the last 90 days
+MAX_HISTORY_MS = 90 * 24 * 60 * 60 * 1000
+# Maximum history windows in flight per request, and retries per window
+ORDER_HISTORY_CONCURRENCY = int(os.getenv("ORDER_HISTORY_CONCURRENCY", "8"))
+ORDER_HISTORY_RETRIES = int(os.getenv("ORDER_HISTORY_RETRIES", "2"))
+ORDER_HISTORY_RETRY_BACKOFF = float(os.getenv("ORDER_HISTORY_RETRY_BACKOFF", "0.5"))
+# Orders per chunk of a streamed order history read from the order store
+ORDER_STREAM_BATCH_SIZE = int(os.getenv("ORDER_STREAM_BATCH_SIZE", "1000"))
+# Maximum leverage changes in flight per batch request
+LEVERAGE_BATCH_CONCURRENCY = int(os.getenv("LEVERAGE_BATCH_CONCURRENCY", "10"))
+# Maximum account snapshots in flight per portfolio request
+PORTFOLIO_CONCURRENCY = int(os.getenv("PORTFOLIO_CONCURRENCY", "16"))
+# Seconds an account's leverage bracket tables are reused before being fetched again
+LEVERAGE_BRACKET_TTL = float(os.getenv("LEVERAGE_BRACKET_TTL", "3600"))
+# Re-fetch this much history before each sync cursor to catch late-arriving records
+ORDER_STORE_SYNC_OVERLAP_MS = int(os.getenv("ORDER_STORE_SYNC_OVERLAP_SECONDS", "300")) * 1000
+# A store synced this recently (by any worker) is served as is instead of being synced again
+ORDER_STORE_MIN_SYNC_INTERVAL_MS = int(float(os.getenv("ORDER_STORE_MIN_SYNC_INTERVAL", "1")) * 1000)
+# Returned with all-symbol order histories: symbols are discovered from income, positions and open orders
+SYMBOL_DISCOVERY_NOTE = (
+    "Symbols are found from income history, open positions and open orders. A symbol whose orders in "
+    "this period were all canceled or expired without any fill is not included; pass symbol= to get it."
+)
 
 class BinanceService:
     @staticmethod
-    def get_client(api_key: str, api_secret: str) -> Client:
-        return Client(api_key, api_secret)
+    @asynccontextmanager
+    async def get_client(api_key: str, api_secret: str) -> AsyncIterator["AsyncClient"]:
+        async with get_client_pool().client(api_key, api_secret) as client:
+            yield client
+
+    @staticmethod
+    async def run_sync(func: Callable, *args, **kwargs):
+        """
+        Run a blocking call in the bounded thread pool so it does not stall the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_sync_executor, functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    async def cached_call(api_key: str, api_secret: str, endpoint: str, **params):
+        """
+        Call a read-only AsyncClient endpoint, sharing in-flight requests and recent results
+        with other callers for the same credentials, endpoint and params.
+        """
+        async def fetch():
+            async with BinanceService.get_client(api_key, api_secret) as client:
+                return await getattr(client, endpoint)(**params)
+
+        key = (credential_key(api_key, api_secret), endpoint, tuple(sorted(params.items())))
+        return await get_request_cache().get_or_fetch(key, fetch)
+
+    @staticmethod
+    def invalidate_cached(api_key: str, api_secret: str, *endpoints: str):
+        get_request_cache().invalidate(credential_key(api_key, api_secret), endpoints)
+        if ACCOUNT_STREAM_ENABLED and "futures_account" in endpoints:
+            # The stream's snapshot is the other read path for the account
+            get_account_streams().invalidate(api_key, api_secret)
+
+    @staticmethod
+    async def get_futures_account(api_key: str, api_secret: str):
+        if ACCOUNT_STREAM_ENABLED:
+            stream = await get_account_streams().get(api_key, api_secret)
+            account_info = await stream.snapshot()
+        else:
+            account_info = await BinanceService.cached_call(api_key, api_secret, "futures_account")
+        return filter_account(account_info)
+
+    @staticmethod
+    async def get_portfolio(accounts: List[PortfolioAccount]) -> Dict[str, Any]:
+        """
+        Combined view of several futures accounts, fetched concurrently.
+
+        Every account snapshot goes through get_futures_account (so the request cache and account
+        streams apply), at most PORTFOLIO_CONCURRENCY at a time, which bounds the wall-clock time
+        by the slowest account rather than the sum. One failing account does not fail the others;
+        it is listed with its error and left out of the totals.
+
+        Args:
+            accounts: API key pairs, each account at most once
+
+        Returns:
+            Summed totals and asset balances, net and gross exposure per symbol, and a per-account
+            summary or error in request order
+        """
+        # Credentials are never echoed back; unnamed accounts are labelled by position
+        labels = [account.label or f"account {i + 1}" for i, account in enumerate(accounts)]
+        if len(set(labels)) != len(labels):
+            raise ValueError("Account labels must be unique")
+
+        results: List[Any] = [None] * len(accounts)
+        credentials = {}
+        seen = set()
+        for i, account in enumerate(accounts):
+            key = credential_key(account.api_key, account.api_secret)
+            if key in seen:
+                results[i] = ValueError("Duplicate account in portfolio")
+                continue
+            seen.add(key)
+            credentials[i] = (account.api_key, account.api_secret)
+
+        semaphore = asyncio.Semaphore(PORTFOLIO_CONCURRENCY)
+
+        async def fetch(i: int):
+            async with semaphore:
+                try:
+                    results[i] = await BinanceService.get_futures_account(*credentials[i])
+                except Exception as e:
+                    results[i] = e
+
+        await asyncio.gather(*[fetch(i) for i in credentials])
+
+        fetched = [(label, result) for label, result in zip(labels, results) if not isinstance(result, Exception)]
+        portfolio = aggregate_accounts(fetched)
+        summaries = iter(portfolio["accounts"])
+        portfolio["accounts"] = [
+            {"account": label, "error": f"Failed to get account: {str(result)}"}
+            if isinstance(result, Exception) else next(summaries)
+            for label, result in zip(labels, results)
+        ]
+        failed = len(results) - len(fetched)
+        return {"succeeded": len(fetched), "failed": failed, **portfolio}
 
     @staticmethod
-    def get_futures_account(api_key: str, api_secret: str):
-        client = BinanceService.get_client(api_key, api_secret)
-        account_info = client.futures_account()
-        account_info["assets"] = [asset for asset in account_info["assets"] if asset["updateTime"] > 0]
-        account_info["positions"] = [position for position in account_info["positions"] if float(position["initialMargin"]) > 0]
-        return account_info
+    async def get_live_pnl(api_key: str, api_secret: str):
+        """
+        Live PnL for an account's open positions, driven by the shared mark-price stream.
+        Tracking keeps the account's user-data stream open so position changes are picked up.
+        """
+        from app.services.live_pnl import get_live_pnl
+
+        stream = await get_account_streams().get(api_key, api_secret)
+        account_info = await stream.snapshot()
+        live_pnl = get_live_pnl()
+        if not live_pnl.is_tracked(stream.key):
+            live_pnl.track(stream.key, account_info)
+        return {"positions": live_pnl.positions(stream.key)}
 
     @staticmethod
-    def change_position_mode(api_key: str, api_secret: str, mode: bool):
-        client = BinanceService.get_client(api_key, api_secret)
-        return client.futures_change_position_mode(dualSidePosition=mode)
+    async def change_position_mode(api_key: str, api_secret: str, mode: bool):
+        try:
+            async with BinanceService.get_client(api_key, api_secret) as client:
+                return await client.futures_change_position_mode(dualSidePosition=mode)
+        finally:
+            BinanceService.invalidate_cached(
+                api_key, api_secret, "futures_get_position_mode", "futures_account", "futures_position_information",
+                "futures_symbol_config"
+            )
     
     @staticmethod
-    def change_leverage(api_key: str, api_secret: str, symbol: str, leverage: int):
+    async def _validate_leverage_change(symbol: str, leverage: int):
+        # Validate leverage range
+        if not 1 <= leverage <= 125:
+            raise ValueError("Leverage must be between 1 and 125")
+
+        # Verify the symbol exists against the cached exchange info
+        await get_exchange_info_cache().validate_symbol(symbol)
+
+    @staticmethod
+    async def _change_leverage(client: "AsyncClient", symbol: str, leverage: int) -> Dict[str, Any]:
+        response = await client.futures_change_leverage(
+            symbol=symbol,
+            leverage=leverage
+        )
+        return {
+            "symbol": response['symbol'],
+            "leverage": response['leverage'],
+            "maxNotionalValue": response['maxNotionalValue']
+        }
+
+    @staticmethod
+    async def change_leverage(api_key: str, api_secret: str, symbol: str, leverage: int):
         """
         Change leverage for a symbol in futures trading.
         Leverage can be changed regardless of position status.
@@ -32,126 +212,552 @@ class BinanceService:
             symbol: Trading pair symbol (e.g., 'BTCUSDT')
             leverage: Target leverage (1-125)
         """
-        client = Client(api_key, api_secret)
         try:
-            # Validate leverage range
-            if not 1 <= leverage <= 125:
-                raise ValueError("Leverage must be between 1 and 125")
-                
-            # Get symbol info to verify if symbol exists
-            symbol_info = client.futures_exchange_info()
-            valid_symbols = [s['symbol'] for s in symbol_info['symbols']]
-            if symbol not in valid_symbols:
-                raise ValueError(f"Invalid symbol: {symbol}")
-                
-            response = client.futures_change_leverage(
-                symbol=symbol,
-                leverage=leverage
-            )
-            return {
-                "symbol": response['symbol'],
-                "leverage": response['leverage'],
-                "maxNotionalValue": response['maxNotionalValue']
-            }
+            await BinanceService._validate_leverage_change(symbol, leverage)
+            try:
+                async with BinanceService.get_client(api_key, api_secret) as client:
+                    return await BinanceService._change_leverage(client, symbol, leverage)
+            finally:
+                BinanceService.invalidate_cached(api_key, api_secret, "futures_account", "futures_position_information", "futures_symbol_config")
         except Exception as e:
             raise Exception(f"Failed to change leverage: {str(e)}")
 
     @staticmethod
-    def get_position_mode(api_key: str, api_secret: str):
-        client = BinanceService.get_client(api_key, api_secret)
-        return client.futures_get_position_mode()
+    async def change_leverage_batch(api_key: str, api_secret: str, changes: List[LeverageChange]) -> Dict[str, Any]:
+        """
+        Change leverage for several symbols at once.
+
+        Every change is validated against the cached exchange info first; the valid ones are then
+        sent concurrently (at most LEVERAGE_BATCH_CONCURRENCY at a time, within the shared weight
+        budget). One failing symbol does not stop the others.
+
+        Args:
+            api_key: Binance API key
+            api_secret: Binance API secret
+            changes: (symbol, leverage) pairs; each symbol may appear only once
+
+        Returns:
+            Per-symbol results in request order, each either the new leverage or an error
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(changes)
+        seen = set()
+        pending = []
+        for i, change in enumerate(changes):
+            try:
+                if change.symbol in seen:
+                    raise ValueError(f"Duplicate symbol in batch: {change.symbol}")
+                seen.add(change.symbol)
+                await BinanceService._validate_leverage_change(change.symbol, change.leverage)
+                pending.append(i)
+            except Exception as e:
+                results[i] = {"symbol": change.symbol, "error": f"Failed to change leverage: {str(e)}"}
+
+        semaphore = asyncio.Semaphore(LEVERAGE_BATCH_CONCURRENCY)
+
+        async def apply(client: "AsyncClient", i: int):
+            change = changes[i]
+            async with semaphore:
+                try:
+                    results[i] = await BinanceService._change_leverage(client, change.symbol, change.leverage)
+                except Exception as e:
+                    results[i] = {"symbol": change.symbol, "error": f"Failed to change leverage: {str(e)}"}
+
+        if pending:
+            try:
+                async with BinanceService.get_client(api_key, api_secret) as client:
+                    await asyncio.gather(*[apply(client, i) for i in pending])
+            finally:
+                BinanceService.invalidate_cached(api_key, api_secret, "futures_account", "futures_position_information", "futures_symbol_config")
+
+        failed = sum(1 for result in results if "error" in result)
+        return {"succeeded": len(results) - failed, "failed": failed, "results": results}
 
     @staticmethod
-    def get_all_orders(api_key: str, api_secret: str, symbol: Optional[str], days: int = 89):
-        if days > 90:
-            return {
-                "error": "Binance only allows fetching orders from the last 90 days",
-                "requested_days": days,
-                "maximum_days": 90
-            }
+    async def get_position_mode(api_key: str, api_secret: str):
+        return await BinanceService.cached_call(api_key, api_secret, "futures_get_position_mode")
 
-        client = BinanceService.get_client(api_key, api_secret)
-        end_time = int(datetime.now().timestamp() * 1000)
-        start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-        
-        all_orders = []
-        all_trades = {}
-        
+    @staticmethod
+    def _history_windows(start_time: int, end_time: int) -> List[Tuple[int, int]]:
+        """
+        Split [start_time, end_time] into the 7-day windows Binance accepts, newest first.
+        """
+        windows = []
         current_end_time = end_time
         while current_end_time > start_time:
-            chunk_start_time = max(
-                start_time,
-                current_end_time - (7 * 24 * 60 * 60 * 1000)
-            )
-            
-            params = {
-                "symbol": "BTCUSDT" if not symbol else symbol,
+            chunk_start_time = max(start_time, current_end_time - HISTORY_WINDOW_MS)
+            windows.append((chunk_start_time, current_end_time))
+            current_end_time = chunk_start_time - 1
+        return windows
+
+    @staticmethod
+    def _is_retryable(e: Exception) -> bool:
+        import aiohttp
+        from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+        if isinstance(e, BinanceAPIException):
+            return e.status_code == 429 or e.status_code >= 500
+        return isinstance(e, (BinanceRequestException, aiohttp.ClientError, asyncio.TimeoutError))
+
+    @staticmethod
+    async def _fetch_window(client: "AsyncClient", semaphore: asyncio.Semaphore, params: Dict[str, Any]):
+        """
+        Fetch orders and trades for one history window, retrying transient failures with backoff.
+        The semaphore is released during the backoff so other windows can use the slot meanwhile.
+        """
+        for attempt in range(ORDER_HISTORY_RETRIES + 1):
+            try:
+                async with semaphore:
+                    return await asyncio.gather(
+                        client.futures_get_all_orders(**params),
+                        client.futures_account_trades(**params),
+                    )
+            except Exception as e:
+                if attempt == ORDER_HISTORY_RETRIES or not BinanceService._is_retryable(e):
+                    raise
+                HISTORY_WINDOW_RETRIES.inc()
+            await asyncio.sleep(ORDER_HISTORY_RETRY_BACKOFF * 2 ** attempt)
+
+    @staticmethod
+    async def _income_symbols(client: "AsyncClient", semaphore: asyncio.Semaphore,
+                              start_time: int, end_time: int) -> Set[str]:
+        """
+        Collect symbols with any income (realized PnL, commission, funding) in one window.
+
+        Each page starts at the last row's time rather than just after it, since more rows may share
+        that millisecond; rows already seen are skipped by tranId.
+        """
+        symbols = set()
+        seen = set()
+        async with semaphore:
+            while start_time <= end_time:
+                income = await client.futures_income_history(startTime=start_time, endTime=end_time, limit=1000)
+                new_rows = [item for item in income if (item.get("tranId"), item.get("incomeType")) not in seen]
+                symbols.update(item["symbol"] for item in new_rows if item.get("symbol"))
+                if len(income) < 1000 or not new_rows:
+                    break
+                seen.update((item.get("tranId"), item.get("incomeType")) for item in new_rows)
+                start_time = income[-1]["time"]
+        return symbols
+
+    @staticmethod
+    async def _traded_symbols(client: "AsyncClient", semaphore: asyncio.Semaphore,
+                              windows: List[Tuple[int, int]]) -> List[str]:
+        """
+        Find the symbols an account traded in the given windows, plus any with an open position or
+        open order. Every fill produces a commission income entry, so income history covers all
+        traded symbols. Orders that never filled leave no income, so a symbol whose orders in the
+        range were all canceled or expired unfilled is only found while it still has an open order
+        (see SYMBOL_DISCOVERY_NOTE).
+        """
+        async def open_position_symbols():
+            async with semaphore:
+                positions = await client.futures_position_information()
+            return {p["symbol"] for p in positions if float(p["positionAmt"]) != 0}
+
+        async def open_order_symbols():
+            async with semaphore:
+                orders = await client.futures_get_open_orders()
+            return {order["symbol"] for order in orders}
+
+        results = await asyncio.gather(
+            open_position_symbols(),
+            open_order_symbols(),
+            *[BinanceService._income_symbols(client, semaphore, chunk_start_time, chunk_end_time)
+              for chunk_start_time, chunk_end_time in windows],
+        )
+        return sorted(set().union(*results))
+
+    @staticmethod
+    async def _fetch_history(client: "AsyncClient", semaphore: asyncio.Semaphore,
+                             windows: Dict[str, List[Tuple[int, int]]], source: str) -> Tuple[List[dict], List[dict]]:
+        """
+        Fetch orders and trades for every (symbol, window) pair under one shared concurrency budget.
+        `source` labels the request in the order_history_windows metric.
+        """
+        HISTORY_WINDOWS.observe(sum(len(symbol_windows) for symbol_windows in windows.values()), source)
+        results = await asyncio.gather(*[
+            BinanceService._fetch_window(client, semaphore, {
+                "symbol": symbol,
                 "startTime": chunk_start_time,
-                "endTime": current_end_time,
+                "endTime": chunk_end_time,
                 "limit": 1000
-            }
-            
-            orders = client.futures_get_all_orders(**params)
-            trades = client.futures_account_trades(**params)
-            
-            for trade in trades:
-                order_id = trade["orderId"]
-                if order_id not in all_trades:
-                    all_trades[order_id] = []
-                all_trades[order_id].append(trade)
-            
+            })
+            for symbol, symbol_windows in windows.items()
+            for chunk_start_time, chunk_end_time in symbol_windows
+        ])
+        all_orders = []
+        all_trades = []
+        for orders, trades in results:
             all_orders.extend(orders)
-            current_end_time = chunk_start_time - 1
+            all_trades.extend(trades)
+        return all_orders, all_trades
 
-        for order in all_orders:
-            order["timeReadable"] = datetime.fromtimestamp(order["time"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            if "updateTime" in order:
-                order["updateTimeReadable"] = datetime.fromtimestamp(order["updateTime"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
-            
-            order_trades = all_trades.get(order["orderId"], [])
-            if order_trades:
-                realized_pnl = sum(float(trade.get("realizedPnl", 0)) for trade in order_trades)
-                order["realizedPnl"] = str(realized_pnl)
-                
-                commission = sum(float(trade.get("commission", 0)) for trade in order_trades)
-                order["commission"] = str(commission)
-                if order_trades[0].get("commissionAsset"):
-                    order["commissionAsset"] = order_trades[0]["commissionAsset"]
+    @staticmethod
+    async def _refresh_orders(client: "AsyncClient", semaphore: asyncio.Semaphore,
+                              order_ids: List[Tuple[str, int]]) -> List[dict]:
+        """
+        Current state of the given (symbol, orderId) orders.
+        """
+        async def refresh(symbol: str, order_id: int) -> dict:
+            async with semaphore:
+                return await client.futures_get_order(symbol=symbol, orderId=order_id)
+
+        return list(await asyncio.gather(*[refresh(symbol, order_id) for symbol, order_id in order_ids]))
+
+    @staticmethod
+    async def _sync_order_store(client: "AsyncClient", semaphore: asyncio.Semaphore, store: OrderStore,
+                                symbol: Optional[str], start_time: int, end_time: int):
+        """
+        Bring the local order store up to date for the requested range, fetching only what is missing.
+
+        Each symbol is re-fetched from its last sync cursor minus a small overlap, and ranges older
+        than the cursor are backfilled when a request looks further back than before. Stored orders
+        that were still open and predate the re-fetched range are refreshed one by one by orderId,
+        so a long-lived GTC order does not pull its whole lifetime back in. Without a symbol, income history since the account-wide cursor tells which
+        symbols have new fills. A symbol synced within ORDER_STORE_MIN_SYNC_INTERVAL_MS is not
+        re-fetched, so a burst of requests across workers costs one sync.
+        """
+        async with store.syncing():
+            cursors = await BinanceService.run_sync(store.get_cursors)
+            open_orders = await BinanceService.run_sync(store.get_open_orders)
+            # Binance only serves the last 90 days; anything older can only come from the store
+            fetch_start = max(start_time, end_time - MAX_HISTORY_MS)
+
+            def is_fresh(key: str) -> bool:
+                return key in cursors and end_time - cursors[key][1] <= ORDER_STORE_MIN_SYNC_INTERVAL_MS
+
+            def missing_ranges(key: str) -> List[Tuple[int, int]]:
+                if key not in cursors:
+                    return [(fetch_start, end_time)]
+                synced_from, synced_until = cursors[key]
+                ranges = []
+                if not is_fresh(key):
+                    ranges.append((max(fetch_start, synced_until - ORDER_STORE_SYNC_OVERLAP_MS), end_time))
+                if fetch_start < synced_from:
+                    ranges.append((fetch_start, synced_from - 1))
+                return ranges
+
+            if symbol:
+                symbols = {symbol}
+                synced_keys = symbols
+            else:
+                discovery_windows = [window for range_start, range_end in missing_ranges(ALL_SYMBOLS)
+                                     for window in BinanceService._history_windows(range_start, range_end)]
+                symbols = set()
+                if discovery_windows:
+                    symbols.update(await BinanceService._traded_symbols(client, semaphore, discovery_windows))
+                symbols.update(open_orders)
+                synced_keys = symbols | {ALL_SYMBOLS}
+
+            windows = {
+                sym: [window for range_start, range_end in missing_ranges(sym)
+                      for window in BinanceService._history_windows(range_start, range_end)]
+                for sym in symbols
+            }
+            # Open orders older than the range being re-fetched; fills land in the recent trade windows
+            stale_orders = [
+                (sym, order_id)
+                for sym in symbols if sym in cursors and not is_fresh(sym)
+                for order_id, created in open_orders.get(sym, [])
+                if created < cursors[sym][1] - ORDER_STORE_SYNC_OVERLAP_MS
+            ]
+            if not any(windows.values()) and not stale_orders and all(is_fresh(key) for key in synced_keys):
+                return
+            orders, trades = await BinanceService._fetch_history(client, semaphore, windows, "sync")
+            orders.extend(await BinanceService._refresh_orders(client, semaphore, stale_orders))
+
+            new_cursors = {}
+            for key in synced_keys:
+                synced_from, synced_until = cursors.get(key, (fetch_start, end_time))
+                # A fresh key's recent range was not fetched, so its cursor stays where it was
+                new_cursors[key] = (min(synced_from, fetch_start), synced_until if is_fresh(key) else end_time)
+            await BinanceService.run_sync(store.save, orders, trades, new_cursors)
+
+    @staticmethod
+    def _history_range(days: int) -> Tuple[int, int]:
+        end_time = int(datetime.now().timestamp() * 1000)
+        start_time = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
+        return start_time, end_time
+
+    @staticmethod
+    async def _synced_order_store(api_key: str, api_secret: str, symbol: Optional[str], start_time: int,
+                                  end_time: int, concurrency: Optional[int] = None) -> OrderStore:
+        store = get_order_store(api_key, api_secret)
+        semaphore = asyncio.Semaphore(concurrency or ORDER_HISTORY_CONCURRENCY)
+        async with BinanceService.get_client(api_key, api_secret) as client:
+            await BinanceService._sync_order_store(client, semaphore, store, symbol, start_time, end_time)
+        return store
+
+    @staticmethod
+    async def _load_history(api_key: str, api_secret: str, symbol: Optional[str], days: int,
+                            concurrency: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Raw orders and trades for the last `days` days, read from the order store when it is enabled
+        and fetched straight from Binance otherwise.
+        """
+        start_time, end_time = BinanceService._history_range(days)
+
+        if ORDER_STORE_ENABLED:
+            store = await BinanceService._synced_order_store(api_key, api_secret, symbol, start_time, end_time, concurrency)
+            return await BinanceService.run_sync(store.load, start_time, symbol)
+
+        semaphore = asyncio.Semaphore(concurrency or ORDER_HISTORY_CONCURRENCY)
+        async with BinanceService.get_client(api_key, api_secret) as client:
+            windows = BinanceService._history_windows(start_time, end_time)
+            if symbol:
+                symbols = [symbol]
+            else:
+                symbols = await BinanceService._traded_symbols(client, semaphore, windows)
+            return await BinanceService._fetch_history(
+                client, semaphore, {window_symbol: windows for window_symbol in symbols}, "direct"
+            )
+
+    @staticmethod
+    async def _load_stored_orders(api_key: str, api_secret: str, symbol: Optional[str], days: int,
+                                  concurrency: Optional[int] = None) -> "OrderColumns":
+        """
+        Orders for the last `days` days with trade totals merged in, from the order store's packed
+        history, which is reused across requests.
+        """
+        start_time, end_time = BinanceService._history_range(days)
+        store = await BinanceService._synced_order_store(api_key, api_secret, symbol, start_time, end_time, concurrency)
+        columns = await BinanceService.run_sync(store.load_columns, start_time)
+        return columns.select(start_time, symbol)
+
+    @staticmethod
+    def _orders_etag(api_key: str, api_secret: str, fingerprint: str) -> str:
+        # The credential is part of the tag: the same URL serves every account, and two accounts
+        # with no orders would otherwise share a fingerprint
+        return f'W/"{credential_key(api_key, api_secret)[:16]}-{fingerprint}"'
+
+    @staticmethod
+    async def get_all_orders(api_key: str, api_secret: str, symbol: Optional[str], days: int = 89,
+                             concurrency: Optional[int] = None, since: Optional[int] = None,
+                             if_none_match: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Get futures orders for the last `days` days, with realized PnL and commission merged in from trades.
+
+        With the order store enabled, history is synced incrementally into the account's local
+        database and read back from it, which also allows looking back further than 90 days.
+        With `since` (ms), only orders updated after it are returned.
+
+        Returns (etag, result). The ETag is derived from the order count and latest update time;
+        when it matches `if_none_match` the result is None and the orders are never rendered.
+        Without the order store nothing is kept, so the upstream dicts are merged in place rather
+        than packed into OrderColumns; either way the CPU-bound work runs in the sync executor.
+        """
+        if days > 90 and not ORDER_STORE_ENABLED:
+            return None, {
+                "error": "Binance only allows fetching orders from the last 90 days",
+                "requested_days": days,
+                "maximum_days": 90
+            }
+
+        from app.services.order_columns import enrich_orders, orders_fingerprint, total_trades
+
+        if ORDER_STORE_ENABLED:
+            columns = await BinanceService._load_stored_orders(api_key, api_secret, symbol, days, concurrency)
+            if since is not None:
+                columns = columns.select(updated_after=since)
+            fingerprint = columns.fingerprint()
+            render = columns.to_dicts
+        else:
+            all_orders, trades = await BinanceService._load_history(api_key, api_secret, symbol, days, concurrency)
+            orders = await BinanceService.run_sync(
+                lambda: enrich_orders(all_orders, total_trades(trades), updated_after=since)
+            )
+            fingerprint = orders_fingerprint(orders)
+            render = None
+        etag = BinanceService._orders_etag(api_key, api_secret, fingerprint)
+        if etag_matches(if_none_match, etag):
+            return etag, None
+        if render is not None:
+            orders = await BinanceService.run_sync(render)
+
+        result = {
+            "total_orders": len(orders),
+            "period": f"Last {days} days",
+            "orders": orders
+        }
+        if not symbol:
+            result["note"] = SYMBOL_DISCOVERY_NOTE
+        return etag, result
+
+    @staticmethod
+    async def stream_all_orders(api_key: str, api_secret: str, symbol: Optional[str], days: int = 89,
+                                concurrency: Optional[int] = None, since: Optional[int] = None) -> AsyncIterator[List[dict]]:
+        """
+        Yield the same enriched orders as get_all_orders, newest first, in batches of one history window each.
+
+        Without the order store, windows are emitted newest first as they arrive. A trade always
+        happens at or after its order's creation time, so by the time a window's orders are emitted,
+        every trade that can belong to them has already been seen and the PnL/commission merge is
+        the same as for the buffered response. With the order store, the synced history is packed
+        once and streamed in batches of ORDER_STREAM_BATCH_SIZE orders. Batches are built in the
+        sync executor.
+        """
+        if days > 90 and not ORDER_STORE_ENABLED:
+            raise ValueError("Binance only allows fetching orders from the last 90 days")
+
+        from app.services.order_columns import enrich_orders, total_trades
+
+        if ORDER_STORE_ENABLED:
+            # The sync is the slow part; the packed history is then written out batch by batch
+            columns = await BinanceService._load_stored_orders(api_key, api_secret, symbol, days, concurrency)
+            rows = columns.select(updated_after=since).iter_dicts()
+            while True:
+                batch = await BinanceService.run_sync(lambda: list(itertools.islice(rows, ORDER_STREAM_BATCH_SIZE)))
+                if not batch:
+                    return
+                yield batch
+
+        start_time, end_time = BinanceService._history_range(days)
+        semaphore = asyncio.Semaphore(concurrency or ORDER_HISTORY_CONCURRENCY)
+        windows = BinanceService._history_windows(start_time, end_time)
+        trade_totals = {}
+
+        async with BinanceService.get_client(api_key, api_secret) as client:
+            symbols = [symbol] if symbol else await BinanceService._traded_symbols(client, semaphore, windows)
+            HISTORY_WINDOWS.observe(len(symbols) * len(windows), "stream")
+            # Start every window now; the semaphore bounds how many are actually in flight
+            window_tasks = [
+                [asyncio.ensure_future(BinanceService._fetch_window(client, semaphore, {
+                    "symbol": window_symbol,
+                    "startTime": window_start,
+                    "endTime": window_end,
+                    "limit": 1000
+                })) for window_symbol in symbols]
+                for window_start, window_end in windows
+            ]
+            def merge(results: List[Tuple[List[dict], List[dict]]]) -> List[dict]:
+                orders = []
+                for window_orders, trades in results:
+                    orders.extend(window_orders)
+                    total_trades(trades, trade_totals)
+                return enrich_orders(orders, trade_totals, updated_after=since)
+
+            try:
+                for tasks in window_tasks:
+                    batch = await BinanceService.run_sync(merge, await asyncio.gather(*tasks))
+                    if batch:
+                        yield batch
+            finally:
+                for tasks in window_tasks:
+                    for task in tasks:
+                        task.cancel()
+
+    @staticmethod
+    async def get_trade_analytics(api_key: str, api_secret: str, symbol: Optional[str], days: int = 89,
+                                  concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Realized PnL, fees, volume and win rate by symbol, side and day, with the equity curve and drawdown.
+
+        Fills are packed into NumPy columns and aggregated in vectorized passes, in the sync
+        executor so a large history does not hold up the event loop.
+        """
+        if days > 90 and not ORDER_STORE_ENABLED:
+            raise ValueError("Binance only allows fetching orders from the last 90 days")
+
+        from app.services.trade_analytics import TradeColumns, analyze_trades
+
+        all_orders, trades = await BinanceService._load_history(api_key, api_secret, symbol, days, concurrency)
+
+        exchange_info = get_exchange_info_cache()
+        margin_assets = {}
+        for trade_symbol in {trade["symbol"] for trade in trades}:
+            info = await exchange_info.get(trade_symbol)
+            if info is not None:
+                margin_assets[trade_symbol] = info.marginAsset
+
+        def analyze():
+            return analyze_trades(TradeColumns(trades, margin_assets))
 
-        all_orders.sort(key=lambda x: x["time"], reverse=True)
-        
         return {
             "total_orders": len(all_orders),
+            "total_fills": len(trades),
             "period": f"Last {days} days",
-            "orders": all_orders
-        } 
+            **await BinanceService.run_sync(analyze),
+        }
+
+    @staticmethod
+    async def warm_up(api_key: str, api_secret: str):
+        """
+        Open the account's pooled connection and load its leverage bracket tables ahead of its first request.
+        """
+        async with BinanceService.get_client(api_key, api_secret) as client:
+            await client.futures_ping()
+        await BinanceService._bracket_tables(api_key, api_secret)
 
     @staticmethod
-    def get_leverage(api_key: str, api_secret: str, symbols: Optional[str] = None) -> Dict[str, Any]:
+    async def _bracket_tables(api_key: str, api_secret: str) -> Dict[str, BracketTable]:
+        """
+        All of an account's leverage bracket tables, fetched in one call and cached for LEVERAGE_BRACKET_TTL.
+        The indexed tables stay in this process; with the shared cache, the raw response is fetched once per node.
+        """
+        credential = credential_key(api_key, api_secret)
+
+        async def fetch_raw():
+            async with BinanceService.get_client(api_key, api_secret) as client:
+                return await client.futures_leverage_bracket()
+
+        async def fetch():
+            shared_cache = get_shared_cache()
+            if shared_cache is None:
+                return index_brackets(await fetch_raw())
+            raw = await shared_cache.get_or_fetch(
+                shared_key(credential, "futures_leverage_bracket"), fetch_raw, ttl=LEVERAGE_BRACKET_TTL
+            )
+            return index_brackets(raw)
+
+        key = (credential, "leverage_brackets", ())
+        return await get_request_cache().get_or_fetch(key, fetch, ttl=LEVERAGE_BRACKET_TTL, shared=False)
+
+    @staticmethod
+    async def get_leverage_brackets(api_key: str, api_secret: str, symbols: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get leverage bracket tables for the given comma-separated symbols, or all symbols
+        """
+        try:
+            tables = await BinanceService._bracket_tables(api_key, api_secret)
+            symbol_list = symbols.split(',') if symbols else list(tables)
+            missing = [symbol for symbol in symbol_list if symbol not in tables]
+            if missing:
+                raise ValueError(f"Invalid symbol: {', '.join(missing)}")
+            return {symbol: tables[symbol].to_dict() for symbol in symbol_list}
+        except Exception as e:
+            raise Exception(f"Error getting leverage brackets: {str(e)}")
+
+    @staticmethod
+    async def get_margin_requirements(api_key: str, api_secret: str, symbol: str, notional: float) -> Dict[str, Any]:
+        """
+        Max leverage and maintenance margin for a position of the given notional size
+        """
+        try:
+            table = (await BinanceService._bracket_tables(api_key, api_secret)).get(symbol)
+            if table is None:
+                raise ValueError(f"Invalid symbol: {symbol}")
+            return table.margin_requirements(notional)
+        except Exception as e:
+            raise Exception(f"Error getting margin requirements: {str(e)}")
+
+    @staticmethod
+    async def get_leverage(api_key: str, api_secret: str, symbols: Optional[str] = None) -> Dict[str, Any]:
         """
         Get current leverage settings for specified symbols, regardless of open positions
         """
         try:
-            print("Calling get_leverage()")
-            client = Client(api_key, api_secret)
-            
-            # If symbols provided, split into list
-            symbol_list = symbols.split(',') if symbols else None
-            
-            response = client.futures_position_information(symbol=symbols)
-            
-            if response['status'] != 200:
-                raise Exception(f"API request failed with status code: {response['status']}")
-            
-            leverage_info = {}
-            print("Binance response:", response)
-            for position in response['result']:
-                symbol = position['symbol']
-                leverage = int(position['leverage'])
-                if symbol_list is None or symbol in symbol_list:
-                    leverage_info[symbol] = leverage
-            
-            return leverage_info
+            # If symbols provided, split into a set
+            symbol_set = set(symbols.split(',')) if symbols else None
+
+            # Binance filters a single symbol server-side; otherwise fetch all and filter here
+            params = {"symbol": symbols} if symbol_set is not None and len(symbol_set) == 1 else {}
+            response = await BinanceService.cached_call(api_key, api_secret, "futures_symbol_config", **params)
+
+            return {
+                config['symbol']: int(config['leverage'])
+                for config in response
+                if symbol_set is None or config['symbol'] in symbol_set
+            }
                 
         except Exception as e:
-            raise Exception(f"Error getting leverage information: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error getting leverage information: {str(e)}")
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from app.services.metrics import Gauge
+
+if TYPE_CHECKING:
+    from binance import AsyncClient
+
+
+def credential_key(api_key: str, api_secret: str) -> str:
+    """
+    Stable, non-reversible identifier for a credential pair, safe to use as a cache key or log field.
+    """
+    return hashlib.sha256(f"{api_key}:{api_secret}".encode()).hexdigest()
+
+
+class _PooledClient:
+    __slots__ = ("client", "last_used", "active", "evicted")
+
+    def __init__(self, client: "AsyncClient"):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.active = 0
+        self.evicted = False
+
+
+class ClientPool:
+    """
+    Registry of warm AsyncClient instances keyed by credential hash.
+
+    Each client keeps its own aiohttp session with a keep-alive connection pool, so repeated
+    calls for the same account reuse TLS connections. Clients are created without the
+    constructor ping, evicted least-recently-used once the pool is full, and closed after
+    sitting idle for longer than the TTL, by a background reaper started with `start()`. A
+    client that is evicted while a request is still using it is closed when that request
+    releases it.
+    """
+
+    def __init__(self, max_clients: int = 64, idle_ttl: float = 300.0, connections_per_client: int = 10):
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.connections_per_client = connections_per_client
+        self._clients: "OrderedDict[str, _PooledClient]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._reaper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def _new_client(self, api_key: str, api_secret: str) -> "AsyncClient":
+        # Imported on first use to keep worker startup fast
+        import aiohttp
+        from app.services.scheduled_client import ScheduledAsyncClient
+
+        connector = aiohttp.TCPConnector(
+            limit=self.connections_per_client,
+            keepalive_timeout=self.idle_ttl,
+            enable_cleanup_closed=True,
+        )
+        return ScheduledAsyncClient(api_key, api_secret, session_params={"connector": connector})
+
+    async def _close(self, entry: _PooledClient):
+        entry.evicted = True
+        if entry.active == 0:
+            await entry.client.close_connection()
+
+    async def _expire_idle(self, now: float):
+        expired = [key for key, entry in self._clients.items()
+                   if entry.active == 0 and now - entry.last_used > self.idle_ttl]
+        for key in expired:
+            await self._close(self._clients.pop(key))
+
+    async def _evict(self, now: float):
+        await self._expire_idle(now)
+        while len(self._clients) >= self.max_clients:
+            _, entry = self._clients.popitem(last=False)
+            await self._close(entry)
+
+    def start(self):
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(min(self.idle_ttl / 2, 60.0))
+            try:
+                async with self._lock:
+                    await self._expire_idle(time.monotonic())
+            except Exception as e:
+                print(f"Error closing idle Binance clients: {str(e)}")
+
+    async def _acquire(self, api_key: str, api_secret: str) -> _PooledClient:
+        key = credential_key(api_key, api_secret)
+        now = time.monotonic()
+        async with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None and entry.client.session.closed:
+                self._clients.pop(key)
+                entry = None
+            if entry is None:
+                await self._evict(now)
+                entry = _PooledClient(self._new_client(api_key, api_secret))
+                self._clients[key] = entry
+            else:
+                self._clients.move_to_end(key)
+            entry.active += 1
+            entry.last_used = now
+            return entry
+
+    async def _release(self, entry: _PooledClient):
+        entry.active -= 1
+        entry.last_used = time.monotonic()
+        if entry.evicted and entry.active == 0:
+            await entry.client.close_connection()
+
+    @asynccontextmanager
+    async def client(self, api_key: str, api_secret: str) -> AsyncIterator["AsyncClient"]:
+        entry = await self._acquire(api_key, api_secret)
+        try:
+            yield entry.client
+        finally:
+            await self._release(entry)
+
+    async def close_all(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._lock:
+            while self._clients:
+                _, entry = self._clients.popitem()
+                await self._close(entry)
+
+
+_pool: Optional[ClientPool] = None
+
+
+def get_client_pool() -> ClientPool:
+    global _pool
+    if _pool is None:
+        _pool = ClientPool(
+            max_clients=int(os.getenv("BINANCE_CLIENT_POOL_SIZE", "64")),
+            idle_ttl=float(os.getenv("BINANCE_CLIENT_IDLE_TTL", "300")),
+            connections_per_client=int(os.getenv("BINANCE_CONNECTIONS_PER_CLIENT", "10")),
+        )
+    return _pool
+
+
+Gauge("binance_client_pool_size", "Warm per-account Binance clients in the pool", lambda: {(): len(get_client_pool())})
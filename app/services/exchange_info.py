@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Optional
+from app.models.futures import SymbolInfo
+from app.services.metrics import EXCHANGE_INFO_LOOKUPS
+from app.services.shared_cache import get_shared_cache
+
+if TYPE_CHECKING:
+    from binance import AsyncClient
+
+
+class ExchangeInfoCache:
+    """
+    Process-wide index of futures symbol metadata.
+
+    The full exchange-info payload is downloaded once at startup and then refreshed in the
+    background every `refresh_interval` seconds. Lookups are plain dict reads. A lookup for an
+    unknown symbol triggers an early refresh (at most once per `miss_refresh_interval`) so newly
+    listed contracts are picked up without waiting for the next scheduled refresh.
+
+    With the shared cache enabled, the payload is downloaded by one worker per node and the
+    others index the stored copy.
+    """
+
+    def __init__(self, refresh_interval: float = 3600.0, miss_refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self.miss_refresh_interval = miss_refresh_interval
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self._fetched_at = 0.0
+        self._client: Optional["AsyncClient"] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._symbols)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self._fetched_at if self._fetched_at else float("inf")
+
+    @staticmethod
+    def _parse(raw: dict) -> SymbolInfo:
+        return SymbolInfo(
+            symbol=raw["symbol"],
+            status=raw.get("status", ""),
+            contractType=raw.get("contractType", ""),
+            pricePrecision=raw.get("pricePrecision", 0),
+            quantityPrecision=raw.get("quantityPrecision", 0),
+            baseAsset=raw.get("baseAsset", ""),
+            quoteAsset=raw.get("quoteAsset", ""),
+            marginAsset=raw.get("marginAsset", ""),
+            filters={f["filterType"]: f for f in raw.get("filters", [])},
+        )
+
+    async def refresh(self, max_age: Optional[float] = None):
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if max_age is not None and self.loaded and self.age <= max_age:
+                return
+            shared_cache = get_shared_cache()
+            if shared_cache is None:
+                info = await self._download()
+            else:
+                info = await shared_cache.get_or_fetch(
+                    "exchange_info", self._download, ttl=self.refresh_interval, max_age=max_age
+                )
+            self._symbols = {raw["symbol"]: self._parse(raw) for raw in info["symbols"]}
+            self._fetched_at = time.monotonic()
+
+    async def _download(self) -> dict:
+        if self._client is None:
+            from app.services.scheduled_client import ScheduledAsyncClient
+
+            # Exchange info is a public endpoint, so one unauthenticated client serves everyone
+            self._client = ScheduledAsyncClient()
+        return await self._client.futures_exchange_info()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing exchange info: {str(e)}")
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Keep starting up; the first lookup will retry the download
+            print(f"Error loading exchange info: {str(e)}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._client is not None:
+            await self._client.close_connection()
+            self._client = None
+
+    async def get(self, symbol: str) -> Optional[SymbolInfo]:
+        info = self._symbols.get(symbol)
+        EXCHANGE_INFO_LOOKUPS.inc("miss" if info is None else "hit")
+        if info is None and (not self.loaded or self.age > self.miss_refresh_interval):
+            await self.refresh(max_age=self.miss_refresh_interval)
+            info = self._symbols.get(symbol)
+        return info
+
+    async def validate_symbol(self, symbol: str) -> SymbolInfo:
+        info = await self.get(symbol)
+        if info is None:
+            raise ValueError(f"Invalid symbol: {symbol}")
+        return info
+
+
+_cache: Optional[ExchangeInfoCache] = None
+
+
+def get_exchange_info_cache() -> ExchangeInfoCache:
+    global _cache
+    if _cache is None:
+        _cache = ExchangeInfoCache(
+            refresh_interval=float(os.getenv("EXCHANGE_INFO_REFRESH_INTERVAL", "3600")),
+            miss_refresh_interval=float(os.getenv("EXCHANGE_INFO_MISS_REFRESH_INTERVAL", "60")),
+        )
+    return _cache
@@ -0,0 +1,46 @@
+from bisect import bisect_right
+from typing import Any, Dict, List
+
+
+class BracketTable:
+    """
+    Notional brackets for one symbol, indexed by notional floor for O(log n) lookup.
+    """
+
+    __slots__ = ("symbol", "brackets", "floors")
+
+    def __init__(self, symbol: str, brackets: List[Dict[str, Any]]):
+        self.symbol = symbol
+        self.brackets = sorted(brackets, key=lambda b: b["notionalFloor"])
+        self.floors = [float(b["notionalFloor"]) for b in self.brackets]
+
+    @property
+    def max_leverage(self) -> int:
+        return max(b["initialLeverage"] for b in self.brackets)
+
+    def lookup(self, notional: float) -> Dict[str, Any]:
+        """
+        Bracket whose [notionalFloor, notionalCap) range contains the notional; notionals past the
+        last cap fall into the last bracket.
+        """
+        index = max(bisect_right(self.floors, abs(notional)) - 1, 0)
+        return self.brackets[index]
+
+    def margin_requirements(self, notional: float) -> Dict[str, Any]:
+        bracket = self.lookup(notional)
+        maint_margin_ratio = float(bracket["maintMarginRatio"])
+        return {
+            "symbol": self.symbol,
+            "notional": notional,
+            "bracket": bracket["bracket"],
+            "maxLeverage": bracket["initialLeverage"],
+            "maintMarginRatio": maint_margin_ratio,
+            "maintMargin": abs(notional) * maint_margin_ratio - float(bracket["cum"]),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"symbol": self.symbol, "maxLeverage": self.max_leverage, "brackets": self.brackets}
+
+
+def index_brackets(response: List[Dict[str, Any]]) -> Dict[str, BracketTable]:
+    return {item["symbol"]: BracketTable(item["symbol"], item["brackets"]) for item in response}
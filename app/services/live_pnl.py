@@ -0,0 +1,233 @@
+import asyncio
+import itertools
+import numpy as np
+import ujson
+import websockets
+from typing import Dict, List, Optional, Set
+
+FUTURES_COMBINED_STREAM_URL = "wss://fstream.binance.com/stream"
+
+# Position columns kept per tracked account, in the order they are packed into arrays
+_POSITION_FIELDS = ("positionAmt", "entryPrice", "leverage", "isolatedWallet", "maintMargin")
+
+
+class PriceTable:
+    """
+    Mark prices in a contiguous float64 array, one slot per symbol. Slots never move, so position
+    arrays can hold slot indices and gather their prices with a single fancy-index.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.slots: Dict[str, int] = {}
+        self.prices = np.full(capacity, np.nan)
+
+    def slot(self, symbol: str) -> int:
+        slot = self.slots.get(symbol)
+        if slot is None:
+            slot = self.slots[symbol] = len(self.slots)
+            if slot >= len(self.prices):
+                self.prices = np.concatenate([self.prices, np.full(len(self.prices), np.nan)])
+        return slot
+
+    def update(self, symbol: str, price: float):
+        self.prices[self.slot(symbol)] = price
+
+
+class MarkPriceFeed:
+    """
+    One combined-stream WebSocket carrying `<symbol>@markPrice@1s` for every symbol in use.
+
+    Symbols are added and removed with live SUBSCRIBE/UNSUBSCRIBE messages, so the connection is
+    shared no matter how many accounts hold a symbol. Each tick is handed to `on_price`.
+    """
+
+    def __init__(self, on_price):
+        self.on_price = on_price
+        self.symbols: Set[str] = set()
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def _stream_name(symbol: str) -> str:
+        return f"{symbol.lower()}@markPrice@1s"
+
+    async def _send(self, method: str, symbols: Set[str]):
+        if self._ws is not None and symbols:
+            await self._ws.send(ujson.dumps({
+                "method": method,
+                "params": [self._stream_name(symbol) for symbol in sorted(symbols)],
+                "id": next(self._ids),
+            }))
+
+    async def set_symbols(self, symbols: Set[str]):
+        added, removed = symbols - self.symbols, self.symbols - symbols
+        self.symbols = set(symbols)
+        if self._task is None and self.symbols:
+            self._task = asyncio.create_task(self._run())
+            return
+        try:
+            await self._send("SUBSCRIBE", added)
+            await self._send("UNSUBSCRIBE", removed)
+        except Exception as e:
+            # The reconnect loop re-subscribes everything in self.symbols
+            print(f"Error updating mark price subscriptions: {str(e)}")
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                async with websockets.connect(FUTURES_COMBINED_STREAM_URL) as ws:
+                    self._ws = ws
+                    backoff = 1
+                    await self._send("SUBSCRIBE", self.symbols)
+                    async for message in ws:
+                        data = ujson.loads(message).get("data")
+                        if data and data.get("e") == "markPriceUpdate":
+                            self.on_price(data["s"], float(data["p"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in mark price stream: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                self._ws = None
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.symbols = set()
+
+
+class LivePnlEngine:
+    """
+    Live unrealized PnL, ROE and liquidation distance for the open positions of every tracked account.
+
+    Positions of all accounts are packed into parallel NumPy arrays whenever an account's
+    positions change, and every mark-price tick recomputes all of them in one vectorized pass,
+    so the cost per tick stays flat as accounts are added.
+
+    Liquidation distance is an estimate: the fraction the mark price can move against the
+    position before its margin buffer (isolated wallet, or the account's cross wallet balance,
+    less maintenance margin) is used up, assuming every other position stays flat.
+    """
+
+    def __init__(self):
+        self.prices = PriceTable()
+        self.feed = MarkPriceFeed(self.on_price)
+        self._accounts: Dict[str, List[dict]] = {}
+        self._cross_buffers: Dict[str, float] = {}
+        self._dirty = False
+        self._keys = np.empty(0, dtype=object)
+        self._positions: List[dict] = []
+        self._slots = np.empty(0, dtype=np.intp)
+        self._columns: Dict[str, np.ndarray] = {field: np.empty(0) for field in _POSITION_FIELDS}
+        self._isolated = np.empty(0, dtype=bool)
+        self._cross_buffer = np.empty(0)
+        self._results: Dict[str, np.ndarray] = {}
+
+    def is_tracked(self, key: str) -> bool:
+        return key in self._accounts
+
+    def track(self, key: str, account: dict):
+        """
+        Start computing live PnL for an account; later snapshots arrive through update_account.
+        """
+        self.update_account(key, account)
+
+    def untrack(self, key: str):
+        if self._accounts.pop(key, None) is not None:
+            self._cross_buffers.pop(key, None)
+            self._dirty = True
+            self._sync_subscriptions()
+
+    def _sync_subscriptions(self):
+        symbols = {p["symbol"] for positions in self._accounts.values() for p in positions}
+        if symbols != self.feed.symbols:
+            for symbol in self.feed.symbols - symbols:
+                # No more ticks will come; a position opened later is seeded afresh
+                self.prices.update(symbol, np.nan)
+            asyncio.get_running_loop().create_task(self.feed.set_symbols(symbols))
+
+    def update_account(self, key: str, account: dict):
+        positions = [dict(p) for p in account["positions"] if float(p["positionAmt"]) != 0]
+        for position in positions:
+            slot = self.prices.slot(position["symbol"])
+            if np.isnan(self.prices.prices[slot]):
+                # Seed with the snapshot's implied mark price until the first tick arrives. A position
+                # opened through the account stream still has the stale notional of "0" from the last
+                # REST snapshot, so it starts from its entry price instead
+                notional = float(position["notional"])
+                if notional != 0:
+                    self.prices.prices[slot] = notional / float(position["positionAmt"])
+                else:
+                    self.prices.prices[slot] = float(position["entryPrice"])
+        self._accounts[key] = positions
+        self._cross_buffers[key] = float(account["totalCrossWalletBalance"]) - float(account["totalMaintMargin"])
+        self._dirty = True
+        self._recompute()
+        self._sync_subscriptions()
+
+    def on_price(self, symbol: str, price: float):
+        self.prices.update(symbol, price)
+        self._recompute()
+
+    def _rebuild(self):
+        rows = [(key, position) for key, positions in self._accounts.items() for position in positions]
+        self._keys = np.array([key for key, _ in rows], dtype=object)
+        self._positions = [position for _, position in rows]
+        self._slots = np.array([self.prices.slot(p["symbol"]) for p in self._positions], dtype=np.intp)
+        self._columns = {
+            field: np.array([float(p[field]) for p in self._positions]) for field in _POSITION_FIELDS
+        }
+        self._isolated = np.array([bool(p["isolated"]) for p in self._positions], dtype=bool)
+        self._cross_buffer = np.array([self._cross_buffers[key] for key, _ in rows])
+        self._dirty = False
+
+    def _recompute(self):
+        if self._dirty:
+            self._rebuild()
+        columns = self._columns
+        amount = columns["positionAmt"]
+        mark = self.prices.prices[self._slots]
+        unrealized = (mark - columns["entryPrice"]) * amount
+        notional = np.abs(amount) * mark
+        initial_margin = np.abs(amount) * columns["entryPrice"] / columns["leverage"]
+        buffer = np.where(self._isolated, columns["isolatedWallet"] - columns["maintMargin"], self._cross_buffer)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._results = {
+                "markPrice": mark,
+                "unrealizedProfit": unrealized,
+                "notional": notional,
+                "roe": unrealized / initial_margin,
+                "liquidationDistance": (buffer + unrealized) / notional,
+            }
+
+    def positions(self, key: str) -> List[dict]:
+        if self._dirty:
+            self._recompute()
+        rows = np.flatnonzero(self._keys == key)
+        return [{
+            "symbol": self._positions[i]["symbol"],
+            "positionSide": self._positions[i]["positionSide"],
+            "positionAmt": self._positions[i]["positionAmt"],
+            "entryPrice": self._positions[i]["entryPrice"],
+            **{name: float(values[i]) for name, values in self._results.items()},
+        } for i in rows]
+
+    async def stop(self):
+        await self.feed.stop()
+        self._accounts.clear()
+        self._dirty = True
+
+
+_engine: Optional[LivePnlEngine] = None
+
+
+def get_live_pnl() -> LivePnlEngine:
+    global _engine
+    if _engine is None:
+        _engine = LivePnlEngine()
+    return _engine
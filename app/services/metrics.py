@@ -0,0 +1,262 @@
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Fraction of successful responses whose payload is printed, for debugging (0 disables payload dumps)
+DEBUG_PAYLOAD_SAMPLE_RATE = float(os.getenv("DEBUG_PAYLOAD_SAMPLE_RATE", "0"))
+
+# Latency buckets in seconds; history requests can take tens of seconds on a cold account
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+WINDOW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    # Every worker keeps its own registry, so each sample is tagged with the process it came from;
+    # with several workers, aggregate across pids (e.g. sum by (route) (rate(...))) in queries
+    pairs.append(f'pid="{os.getpid()}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value == int(value) else repr(float(value))
+
+
+class Counter:
+    """
+    Monotonic count per label combination.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Labels, float] = {}
+        # Some counters are bumped from executor threads
+        self._lock = threading.Lock()
+        _register(self)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}_total{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in values]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label combination, in the Prometheus exposition layout.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> [count per bucket (not cumulative)..., sum]
+        self._values: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * len(self.buckets) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        lines = []
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Point-in-time values, read from `collect` whenever metrics are rendered.
+
+    `collect` returns {label values: value}; state that already lives elsewhere (the weight
+    scheduler, the client pool) is read at scrape time instead of being mirrored on every change.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Dict[Labels, float]],
+                 labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+        _register(self)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+                for labels, value in self.collect().items()]
+
+
+_metrics: List = []
+
+
+def _register(metric):
+    _metrics.append(metric)
+
+
+def render_metrics() -> str:
+    """
+    Every registered metric of this worker process in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _metrics:
+        try:
+            samples = metric.samples()
+        except Exception as e:
+            # One broken gauge should not take the whole scrape down
+            print(f"Error collecting metric {metric.name}: {str(e)}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def sample_payload(route: str, payload) -> None:
+    """
+    Print a route's response payload for a DEBUG_PAYLOAD_SAMPLE_RATE fraction of calls.
+    """
+    if DEBUG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < DEBUG_PAYLOAD_SAMPLE_RATE:
+        print(f"{route} response: {payload}")
+
+
+_START_TIME = time.time()
+
+Gauge("process_start_time_seconds", "Start time of the worker process, so restarts show up as counter resets",
+      lambda: {(): _START_TIME})
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response, by route template",
+    ("method", "route", "status"),
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "binance_request_duration_seconds",
+    "Binance REST call latency once admitted by the weight scheduler, by endpoint and HTTP status",
+    ("method", "endpoint", "status"),
+)
+UPSTREAM_WEIGHT_WAIT_SECONDS = Histogram(
+    "binance_weight_wait_seconds",
+    "Time Binance calls waited for request-weight budget, by priority",
+    ("priority",),
+)
+UPSTREAM_WEIGHT = Counter(
+    "binance_request_weight",
+    "Request weight reserved for Binance calls, by priority",
+    ("priority",),
+)
+HISTORY_WINDOWS = Histogram(
+    "order_history_windows",
+    "(symbol, 7-day window) pairs fetched from Binance per order-history load",
+    ("source",),
+    buckets=WINDOW_BUCKETS,
+)
+HISTORY_WINDOW_RETRIES = Counter(
+    "order_history_window_retries",
+    "History windows retried after a transient upstream failure",
+)
+REQUEST_CACHE_REQUESTS = Counter(
+    "request_cache_requests",
+    "Coalesced upstream reads by endpoint; hit means served from the TTL cache or an in-flight request",
+    ("endpoint", "result"),
+)
+ORDER_COLUMNS_CACHE_REQUESTS = Counter(
+    "order_columns_cache_requests",
+    "Reads of an account's packed order history, by whether the packed copy could be reused",
+    ("result",),
+)
+SHARED_CACHE_REQUESTS = Counter(
+    "shared_cache_requests",
+    "Node-wide cache reads: hit, served after waiting for another worker's fetch (wait), or fetched here",
+    ("result",),
+)
+SHARED_CACHE_BUSY = Counter(
+    "shared_cache_busy",
+    "Node-wide cache operations skipped or handled locally because another worker held the database lock",
+    ("operation",),
+)
+EXCHANGE_INFO_LOOKUPS = Counter(
+    "exchange_info_lookups",
+    "Symbol lookups against the exchange-info cache, by whether the symbol was already indexed",
+    ("result",),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records HTTP_REQUEST_SECONDS for every HTTP request.
+
+    Requests are labelled with the matched route's path template rather than the raw path, so
+    unknown URLs cannot blow up the number of series. Streaming responses are timed up to
+    their final body chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"], getattr(route, "path", "unmatched"), status,
+            )
@@ -0,0 +1,357 @@
+import numpy as np
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Upstream order fields by storage type, in the order they are written back out
+ORDER_FIELDS = (
+    "orderId", "symbol", "status", "clientOrderId", "price", "avgPrice", "origQty", "executedQty", "cumQuote",
+    "timeInForce", "type", "reduceOnly", "closePosition", "side", "positionSide", "stopPrice", "workingType",
+    "priceMatch", "selfTradePreventionMode", "goodTillDate", "priceProtect", "origType", "time", "updateTime",
+)
+INT_FIELDS = ("orderId", "goodTillDate", "time", "updateTime")
+DECIMAL_FIELDS = ("price", "avgPrice", "origQty", "executedQty", "cumQuote", "stopPrice")
+BOOL_FIELDS = ("reduceOnly", "closePosition", "priceProtect")
+ENUM_FIELDS = (
+    "symbol", "status", "timeInForce", "type", "side", "positionSide", "workingType", "priceMatch",
+    "selfTradePreventionMode", "origType",
+)
+_KNOWN_FIELDS = frozenset(ORDER_FIELDS)
+
+READABLE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# "%.<n>f" for every decimal-place count an int8 scale can hold
+_FIXED_FORMATS = [f"%.{scale}f" for scale in range(128)]
+# Decimal strings up to this long hold at most 15 significant digits, which always survive a
+# float64 round trip; longer ones are checked
+_FLOAT_EXACT_LENGTH = 15
+
+# Stands in for a field the upstream record does not have, as opposed to one set to null
+_ABSENT = object()
+
+
+class EnumTable:
+    """
+    Process-wide string <-> small int mapping for one low-cardinality field.
+    """
+
+    __slots__ = ("values", "codes", "_lock")
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            # Packing runs in executor threads; codes must stay unique
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    self.values.append(value)
+                    code = self.codes[value] = len(self.values) - 1
+        return code
+
+    def encode_all(self, values: List[str]) -> np.ndarray:
+        codes = self.codes
+        encoded = [codes.get(value) for value in values]
+        if None in encoded:
+            encoded = [self.encode(value) for value in values]
+        return np.array(encoded, dtype=np.uint16).reshape(len(values))
+
+
+_ENUMS: Dict[str, EnumTable] = {field: EnumTable() for field in ENUM_FIELDS + ("commissionAsset",)}
+
+
+class TradeTotals:
+    """
+    Realized PnL and commission summed over one order's fills.
+    """
+
+    __slots__ = ("realized_pnl", "commission", "commission_asset")
+
+    def __init__(self):
+        self.realized_pnl = 0.0
+        self.commission = 0.0
+        self.commission_asset: Optional[str] = None
+
+
+def total_trades(trades: List[dict],
+                 totals: Optional[Dict[Tuple[str, int], TradeTotals]] = None) -> Dict[Tuple[str, int], TradeTotals]:
+    """
+    Sum fills per (symbol, orderId), optionally adding to existing totals.
+    """
+    if totals is None:
+        totals = {}
+    for trade in trades:
+        # Order ids are only unique per symbol
+        order_key = (trade["symbol"], trade["orderId"])
+        order_totals = totals.get(order_key)
+        if order_totals is None:
+            order_totals = totals[order_key] = TradeTotals()
+            order_totals.commission_asset = trade.get("commissionAsset") or None
+        order_totals.realized_pnl += float(trade.get("realizedPnl", 0))
+        order_totals.commission += float(trade.get("commission", 0))
+    return totals
+
+
+def last_update(order: dict) -> int:
+    """
+    An order's updateTime, falling back to its creation time where upstream left it out.
+    """
+    return max(order.get("updateTime") or 0, order["time"])
+
+
+def orders_fingerprint(orders: List[dict]) -> str:
+    """
+    OrderColumns.fingerprint for a list of order dicts.
+    """
+    latest = max((last_update(order) for order in orders), default=0)
+    return f"{len(orders)}-{latest}"
+
+
+def enrich_orders(orders: List[dict], trade_totals: Dict[Tuple[str, int], TradeTotals],
+                  updated_after: Optional[int] = None) -> List[dict]:
+    """
+    The same output as OrderColumns.pack(...).select(updated_after=...).to_dicts(), built by
+    adding fields to the upstream dicts in place. For histories that are rendered once and not
+    kept, this skips packing columns only to unpack them again.
+    """
+    if updated_after is not None:
+        orders = [order for order in orders if last_update(order) > updated_after]
+    readable: Dict[int, str] = {}
+
+    def readable_time(ms: int) -> str:
+        seconds = ms // 1000
+        text = readable.get(seconds)
+        if text is None:
+            text = readable[seconds] = datetime.fromtimestamp(ms / 1000).strftime(READABLE_TIME_FORMAT)
+        return text
+
+    for order in orders:
+        order["timeReadable"] = readable_time(order["time"])
+        if order.get("updateTime") is not None:
+            order["updateTimeReadable"] = readable_time(order["updateTime"])
+        totals = trade_totals.get((order["symbol"], order["orderId"]))
+        if totals is not None:
+            order["realizedPnl"] = str(totals.realized_pnl)
+            order["commission"] = str(totals.commission)
+            if totals.commission_asset:
+                order["commissionAsset"] = totals.commission_asset
+    # Newest first; equal times keep upstream order
+    orders.sort(key=lambda order: order["time"], reverse=True)
+    return orders
+
+
+class OrderColumns:
+    """
+    Orders with their trade totals merged in, held column-wise, newest first.
+
+    Every field is parsed once when packed: ids and timestamps into int64 arrays, prices and
+    quantities into float64 plus an int8 count of decimal places (so "0.40" comes back as
+    "0.40", not "0.4"), flags into bool, and enum-like strings (symbol, status, side, ...)
+    into uint16 codes against process-wide tables. Only clientOrderId stays a Python string per
+    order. float64 holds 15 significant digits, so a decimal string longer than that is kept
+    as is in `exact` whenever formatting it back from the float would change it. Readable
+    timestamps and string-formatted numbers are produced by `to_dicts` when a response is built,
+    and are never stored. Fields missing from an upstream record stay missing in its output,
+    fields set to null stay null, and fields this class does not know about are carried through
+    unchanged.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], scales: Dict[str, np.ndarray], client_order_ids: List[str],
+                 missing: Dict[str, np.ndarray], extras: Dict[int, dict], nulls: Dict[str, np.ndarray],
+                 exact: Dict[str, Dict[int, str]]):
+        self.columns = columns
+        self.scales = scales
+        self.client_order_ids = client_order_ids
+        self.missing = missing
+        self.extras = extras
+        self.nulls = nulls
+        self.exact = exact
+
+    @classmethod
+    def pack(cls, orders: List[dict], trade_totals: Dict[Tuple[str, int], TradeTotals]) -> "OrderColumns":
+        n = len(orders)
+        time = np.fromiter((o["time"] for o in orders), dtype=np.int64, count=n)
+        # Newest first; equal times keep upstream order, like a reverse list.sort
+        order = np.argsort(-time, kind="stable")
+        orders = [orders[i] for i in order.tolist()]
+
+        columns: Dict[str, np.ndarray] = {}
+        scales: Dict[str, np.ndarray] = {}
+        missing: Dict[str, np.ndarray] = {}
+        nulls: Dict[str, np.ndarray] = {}
+        exact: Dict[str, Dict[int, str]] = {}
+
+        def column(field: str, default) -> list:
+            values = [o.get(field, _ABSENT) for o in orders]
+            if _ABSENT in values:
+                missing[field] = np.fromiter((v is _ABSENT for v in values), dtype=bool, count=n)
+                values = [default if v is _ABSENT else v for v in values]
+            if None in values:
+                nulls[field] = np.fromiter((v is None for v in values), dtype=bool, count=n)
+                values = [default if v is None else v for v in values]
+            return values
+
+        for field in INT_FIELDS:
+            columns[field] = np.array(column(field, 0), dtype=np.int64).reshape(n)
+        for field in DECIMAL_FIELDS:
+            text = np.array(column(field, "0"), dtype=str).reshape(n)
+            columns[field] = text.astype(np.float64)
+            length = np.strings.str_len(text)
+            point = np.strings.find(text, ".")
+            scales[field] = np.where(point < 0, 0, length - point - 1).astype(np.int8)
+            long_rows = np.flatnonzero(length > _FLOAT_EXACT_LENGTH).tolist()
+            if long_rows:
+                number, scale = columns[field], scales[field]
+                kept = {i: str(text[i]) for i in long_rows if _FIXED_FORMATS[scale[i]] % number[i] != text[i]}
+                if kept:
+                    exact[field] = kept
+        for field in BOOL_FIELDS:
+            columns[field] = np.array(column(field, False), dtype=bool).reshape(n)
+        for field in ENUM_FIELDS:
+            columns[field] = _ENUMS[field].encode_all(column(field, ""))
+
+        totals = [trade_totals.get((o["symbol"], o["orderId"])) for o in orders]
+        columns["realizedPnl"] = np.fromiter((t.realized_pnl if t else 0.0 for t in totals), dtype=np.float64, count=n)
+        columns["commission"] = np.fromiter((t.commission if t else 0.0 for t in totals), dtype=np.float64, count=n)
+        columns["commissionAsset"] = _ENUMS["commissionAsset"].encode_all(
+            [(t.commission_asset if t else None) or "" for t in totals]
+        )
+        missing["realizedPnl"] = missing["commission"] = np.fromiter((t is None for t in totals), dtype=bool, count=n)
+        missing["commissionAsset"] = np.fromiter((not (t and t.commission_asset) for t in totals), dtype=bool, count=n)
+
+        client_order_ids = column("clientOrderId", "")
+        extras = {}
+        for i, o in enumerate(orders):
+            if not _KNOWN_FIELDS.issuperset(o):
+                extras[i] = {k: v for k, v in o.items() if k not in _KNOWN_FIELDS}
+        return cls(columns, scales, client_order_ids, missing, extras, nulls, exact)
+
+    def __len__(self) -> int:
+        return len(self.client_order_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by this instance, for benchmarks and cache accounting.
+        """
+        return (
+            sum(values.nbytes for values in self.columns.values())
+            + sum(scale.nbytes for scale in self.scales.values())
+            + sum(mask.nbytes for mask in self.missing.values())
+            + sum(mask.nbytes for mask in self.nulls.values())
+            + sys.getsizeof(self.client_order_ids) + sum(sys.getsizeof(s) for s in self.client_order_ids)
+        )
+
+    def select(self, start_time: Optional[int] = None, symbol: Optional[str] = None,
+               end_time: Optional[int] = None, updated_after: Optional[int] = None) -> "OrderColumns":
+        """
+        Orders created in [start_time, end_time], optionally for one symbol and only those last
+        updated after `updated_after`, as a new instance.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        time = self.columns["time"]
+        if start_time is not None:
+            keep &= time >= start_time
+        if end_time is not None:
+            keep &= time <= end_time
+        if updated_after is not None:
+            keep &= self.last_update > updated_after
+        if symbol:
+            code = _ENUMS["symbol"].codes.get(symbol)
+            if code is None:
+                keep[:] = False
+            else:
+                keep &= self.columns["symbol"] == code
+        if keep.all():
+            return self
+        rows = np.flatnonzero(keep)
+        row_map = {old: new for new, old in enumerate(rows.tolist())}
+        return OrderColumns(
+            {field: values[rows] for field, values in self.columns.items()},
+            {field: scale[rows] for field, scale in self.scales.items()},
+            [self.client_order_ids[i] for i in rows.tolist()],
+            {field: mask[rows] for field, mask in self.missing.items()},
+            {row_map[old]: extra for old, extra in self.extras.items() if old in row_map},
+            {field: mask[rows] for field, mask in self.nulls.items()},
+            {field: {row_map[old]: text for old, text in kept.items() if old in row_map}
+             for field, kept in self.exact.items()},
+        )
+
+    @property
+    def last_update(self) -> np.ndarray:
+        """
+        Each order's updateTime, falling back to its creation time where upstream left it out.
+        """
+        return np.maximum(self.columns["updateTime"], self.columns["time"])
+
+    def fingerprint(self) -> str:
+        """
+        Cheap version tag of these orders: their count and latest update time. Any new, filled,
+        cancelled or amended order moves one of the two, so equal fingerprints mean an unchanged
+        history without rendering it.
+        """
+        latest = int(self.last_update.max()) if len(self) else 0
+        return f"{len(self)}-{latest}"
+
+    def to_dicts(self) -> List[dict]:
+        return list(self.iter_dicts())
+
+    def iter_dicts(self) -> Iterator[dict]:
+        """
+        Yield orders in the upstream shape plus timeReadable, updateTimeReadable, realizedPnl,
+        commission and commissionAsset, as get_all_orders has always returned them.
+        """
+        values: Dict[str, list] = {}
+        for field in INT_FIELDS + BOOL_FIELDS:
+            values[field] = self.columns[field].tolist()
+        for field in DECIMAL_FIELDS:
+            values[field] = [_FIXED_FORMATS[scale] % v for v, scale in zip(self.columns[field].tolist(), self.scales[field].tolist())]
+            for i, text in self.exact.get(field, {}).items():
+                values[field][i] = text
+        for field in ENUM_FIELDS + ("commissionAsset",):
+            names = _ENUMS[field].values
+            values[field] = [names[code] for code in self.columns[field].tolist()]
+        values["clientOrderId"] = self.client_order_ids
+        values["realizedPnl"] = [str(v) for v in self.columns["realizedPnl"].tolist()]
+        values["commission"] = [str(v) for v in self.columns["commission"].tolist()]
+
+        readable: Dict[int, str] = {}
+
+        def readable_time(ms: int) -> str:
+            seconds = ms // 1000
+            text = readable.get(seconds)
+            if text is None:
+                text = readable[seconds] = datetime.fromtimestamp(ms / 1000).strftime(READABLE_TIME_FORMAT)
+            return text
+
+        missing = {field: mask.tolist() for field, mask in self.missing.items() if mask.any()}
+        order_missing = [(field, mask) for field, mask in missing.items() if field in _KNOWN_FIELDS]
+        order_nulls = [(field, mask.tolist()) for field, mask in self.nulls.items() if mask.any()]
+        update_time_null = dict(order_nulls).get("updateTime")
+        update_time_missing = missing.get("updateTime")
+        trades_missing = missing.get("realizedPnl")
+        asset_missing = missing.get("commissionAsset")
+        for i, row in enumerate(zip(*[values[field] for field in ORDER_FIELDS])):
+            order = dict(zip(ORDER_FIELDS, row))
+            for field, mask in order_missing:
+                if mask[i]:
+                    del order[field]
+            for field, mask in order_nulls:
+                if mask[i]:
+                    order[field] = None
+            if i in self.extras:
+                order.update(self.extras[i])
+            order["timeReadable"] = readable_time(order["time"])
+            if not (update_time_missing and update_time_missing[i]) and not (update_time_null and update_time_null[i]):
+                order["updateTimeReadable"] = readable_time(order["updateTime"])
+            if not (trades_missing and trades_missing[i]):
+                order["realizedPnl"] = values["realizedPnl"][i]
+                order["commission"] = values["commission"][i]
+                if not (asset_missing and asset_missing[i]):
+                    order["commissionAsset"] = values["commissionAsset"][i]
+            yield order
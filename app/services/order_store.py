@@ -0,0 +1,233 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from app.services.client_pool import credential_key
+from app.services.metrics import ORDER_COLUMNS_CACHE_REQUESTS
+from app.services.shared_cache import node_lock
+
+if TYPE_CHECKING:
+    from app.services.order_columns import OrderColumns
+
+# Cursor row that tracks symbol discovery for the account as a whole
+ALL_SYMBOLS = "*"
+
+# Orders in these states can still change, so they are refreshed on every sync
+OPEN_ORDER_STATUSES = ("NEW", "PARTIALLY_FILLED")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    symbol TEXT NOT NULL,
+    orderId INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    updateTime INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (symbol, orderId)
+);
+CREATE INDEX IF NOT EXISTS orders_time ON orders (time);
+CREATE INDEX IF NOT EXISTS orders_symbol_time ON orders (symbol, time);
+
+CREATE TABLE IF NOT EXISTS trades (
+    symbol TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    orderId INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (symbol, id)
+);
+CREATE INDEX IF NOT EXISTS trades_time ON trades (time);
+CREATE INDEX IF NOT EXISTS trades_symbol_time ON trades (symbol, time);
+
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    symbol TEXT PRIMARY KEY,
+    synced_from INTEGER NOT NULL,
+    synced_until INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS store_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_version VALUES (0, 0);
+"""
+
+
+class OrderStore:
+    """
+    SQLite store of one account's futures orders and trades.
+
+    Raw upstream records are kept as JSON next to the indexed columns used for range reads,
+    and `sync_cursors` records which time range has been downloaded for each symbol, so a
+    refresh only has to fetch what is newer than the last sync. All methods are blocking;
+    call them through BinanceService.run_sync from async code.
+
+    `version` goes up whenever a save actually changes a stored order or trade, which lets
+    `load_columns` keep serving its last packed result while a re-sync brings nothing new.
+    It is stored in the database, and `syncing` holds a file lock next to it, so worker
+    processes sharing the store see each other's saves and never download the same history.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sync_lock = asyncio.Lock()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._packed: Optional[Tuple[int, int, "OrderColumns"]] = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @asynccontextmanager
+    async def syncing(self) -> AsyncIterator[None]:
+        """
+        Held while syncing, by one task on the node at a time.
+        """
+        async with self._sync_lock:
+            async with node_lock(self.path + ".lock"):
+                yield
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT version FROM store_version").fetchone()[0]
+
+    def get_cursors(self) -> Dict[str, Tuple[int, int]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT symbol, synced_from, synced_until FROM sync_cursors").fetchall()
+        return {symbol: (synced_from, synced_until) for symbol, synced_from, synced_until in rows}
+
+    def get_open_orders(self) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        (orderId, creation time) of every still-open order, per symbol.
+        """
+        placeholders = ",".join("?" * len(OPEN_ORDER_STATUSES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT symbol, orderId, time FROM orders WHERE status IN ({placeholders})",
+                OPEN_ORDER_STATUSES,
+            ).fetchall()
+        open_orders = {}
+        for symbol, order_id, created in rows:
+            open_orders.setdefault(symbol, []).append((order_id, created))
+        return open_orders
+
+    def save(self, orders: Iterable[dict], trades: Iterable[dict], cursors: Dict[str, Tuple[int, int]]):
+        """
+        Upsert orders and trades and advance the sync cursors in a single transaction.
+        """
+        with self._lock, self._conn:
+            changes = self._conn.total_changes
+            # Re-fetched rows that did not change are skipped, so they do not count as changes
+            self._conn.executemany(
+                "INSERT INTO orders (symbol, orderId, status, time, updateTime, data) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, orderId) DO UPDATE SET status = excluded.status, time = excluded.time, "
+                "updateTime = excluded.updateTime, data = excluded.data WHERE data != excluded.data",
+                [(o["symbol"], o["orderId"], o["status"], o["time"], o.get("updateTime", o["time"]), json.dumps(o))
+                 for o in orders],
+            )
+            self._conn.executemany(
+                "INSERT INTO trades (symbol, id, orderId, time, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, id) DO UPDATE SET orderId = excluded.orderId, time = excluded.time, "
+                "data = excluded.data WHERE data != excluded.data",
+                [(t["symbol"], t["id"], t["orderId"], t["time"], json.dumps(t)) for t in trades],
+            )
+            if self._conn.total_changes != changes:
+                self._conn.execute("UPDATE store_version SET version = version + 1")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_cursors (symbol, synced_from, synced_until) VALUES (?, ?, ?)",
+                [(symbol, synced_from, synced_until) for symbol, (synced_from, synced_until) in cursors.items()],
+            )
+
+    def load(self, start_time: int, symbol: Optional[str] = None,
+             end_time: Optional[int] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Read orders created in [start_time, end_time], and the trades made in the same range.
+        """
+        where, params = "time >= ?", [start_time]
+        if end_time is not None:
+            where, params = where + " AND time <= ?", params + [end_time]
+        if symbol:
+            where, params = "symbol = ? AND " + where, [symbol] + params
+        with self._lock:
+            orders = self._conn.execute(f"SELECT data FROM orders WHERE {where}", params).fetchall()
+            trades = self._conn.execute(f"SELECT data FROM trades WHERE {where}", params).fetchall()
+        return [json.loads(row[0]) for row in orders], [json.loads(row[0]) for row in trades]
+
+    def load_columns(self, start_time: int) -> "OrderColumns":
+        """
+        Orders created since start_time with their trade totals merged in, packed into OrderColumns.
+
+        The packed result is kept for the most recently used accounts (ORDER_CACHE_ACCOUNTS) and
+        reused until the store changes or an earlier start time is asked for; narrower requests
+        are cut from it with OrderColumns.select.
+        """
+        # NumPy-backed, so imported on first use rather than at startup
+        from app.services.order_columns import OrderColumns, total_trades
+
+        packed = self._packed
+        if packed is not None and packed[0] == self.version and packed[1] <= start_time:
+            ORDER_COLUMNS_CACHE_REQUESTS.inc("hit")
+            _touch_packed(self)
+            return packed[2]
+        ORDER_COLUMNS_CACHE_REQUESTS.inc("miss")
+        # A save racing with this load bumps the version, so the next call reloads
+        version = self.version
+        orders, trades = self.load(start_time)
+        columns = OrderColumns.pack(orders, total_trades(trades))
+        self._packed = (version, start_time, columns)
+        _touch_packed(self)
+        return columns
+
+    def drop_columns(self):
+        self._packed = None
+
+
+# Off by default: when on, every account's order history is written to disk under ORDER_STORE_DIR.
+# Multi-worker deploys (deploy.sh with WORKERS > 1) turn it on: it is what fetches history once per
+# node, since order histories are too large for the shared cache and are never put in it
+ORDER_STORE_ENABLED = os.getenv("ORDER_STORE_ENABLED", "false").lower() == "true"
+ORDER_STORE_DIR = os.getenv("ORDER_STORE_DIR", "data/orders")
+# Accounts whose packed order history is kept in memory between requests
+ORDER_CACHE_ACCOUNTS = int(os.getenv("ORDER_CACHE_ACCOUNTS", "32"))
+
+_stores: Dict[str, OrderStore] = {}
+_packed_stores: "OrderedDict[str, OrderStore]" = OrderedDict()
+_packed_lock = threading.Lock()
+
+
+def _touch_packed(store: OrderStore):
+    with _packed_lock:
+        _packed_stores[store.path] = store
+        _packed_stores.move_to_end(store.path)
+        while len(_packed_stores) > ORDER_CACHE_ACCOUNTS:
+            _, evicted = _packed_stores.popitem(last=False)
+            evicted.drop_columns()
+
+
+def get_order_store(api_key: str, api_secret: str) -> OrderStore:
+    """
+    Return the store for an account, opening `<ORDER_STORE_DIR>/<credential hash>.sqlite3` on first use.
+    """
+    key = credential_key(api_key, api_secret)
+    store = _stores.get(key)
+    if store is None:
+        os.makedirs(ORDER_STORE_DIR, exist_ok=True)
+        store = _stores[key] = OrderStore(os.path.join(ORDER_STORE_DIR, f"{key}.sqlite3"))
+    return store
+
+
+def close_order_stores():
+    with _packed_lock:
+        _packed_stores.clear()
+    while _stores:
+        _, store = _stores.popitem()
+        store.close()
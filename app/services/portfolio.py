@@ -0,0 +1,72 @@
+from typing import Any, Dict, List, Tuple
+
+# Account-level totals summed across the portfolio
+ACCOUNT_TOTALS = (
+    "totalWalletBalance", "totalUnrealizedProfit", "totalMarginBalance", "totalInitialMargin", "totalMaintMargin",
+    "totalPositionInitialMargin", "totalOpenOrderInitialMargin", "totalCrossWalletBalance", "totalCrossUnPnl",
+    "availableBalance", "maxWithdrawAmount",
+)
+# Per-asset balances summed across the portfolio
+ASSET_TOTALS = (
+    "walletBalance", "unrealizedProfit", "marginBalance", "maintMargin", "initialMargin", "availableBalance",
+    "maxWithdrawAmount",
+)
+# Account fields echoed in the per-account summary
+ACCOUNT_SUMMARY = ("totalWalletBalance", "totalUnrealizedProfit", "totalMarginBalance", "availableBalance")
+
+
+def aggregate_accounts(accounts: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge filtered account snapshots, given as (label, account), into one portfolio view.
+
+    Totals and asset balances are summed. Positions are netted per symbol: positionAmt and
+    notional are signed (short legs are negative, in one-way and hedge mode alike), so a long
+    in one account offsets a short in another, while the long and short legs are also kept
+    separately as gross exposure.
+    """
+    totals = dict.fromkeys(ACCOUNT_TOTALS, 0.0)
+    assets: Dict[str, Dict[str, float]] = {}
+    exposure: Dict[str, Dict[str, Any]] = {}
+    summaries = []
+
+    for label, account in accounts:
+        for field in ACCOUNT_TOTALS:
+            totals[field] += float(account.get(field, 0))
+        for asset in account["assets"]:
+            merged = assets.get(asset["asset"])
+            if merged is None:
+                merged = assets[asset["asset"]] = dict.fromkeys(ASSET_TOTALS, 0.0)
+            for field in ASSET_TOTALS:
+                merged[field] += float(asset.get(field, 0))
+        for position in account["positions"]:
+            amount = float(position["positionAmt"])
+            notional = float(position["notional"])
+            merged = exposure.get(position["symbol"])
+            if merged is None:
+                merged = exposure[position["symbol"]] = {
+                    "netQty": 0.0, "longQty": 0.0, "shortQty": 0.0, "netNotional": 0.0, "grossNotional": 0.0,
+                    "unrealizedProfit": 0.0, "initialMargin": 0.0, "maintMargin": 0.0, "accounts": [],
+                }
+            merged["netQty"] += amount
+            merged["longQty"] += max(amount, 0.0)
+            merged["shortQty"] += max(-amount, 0.0)
+            merged["netNotional"] += notional
+            merged["grossNotional"] += abs(notional)
+            merged["unrealizedProfit"] += float(position["unrealizedProfit"])
+            merged["initialMargin"] += float(position["initialMargin"])
+            merged["maintMargin"] += float(position["maintMargin"])
+            if label not in merged["accounts"]:
+                merged["accounts"].append(label)
+        summaries.append({
+            "account": label,
+            **{field: float(account.get(field, 0)) for field in ACCOUNT_SUMMARY},
+            "positions": len(account["positions"]),
+        })
+
+    return {
+        "totals": totals,
+        "assets": assets,
+        # Largest exposure first
+        "exposure": dict(sorted(exposure.items(), key=lambda item: -item[1]["grossNotional"])),
+        "accounts": summaries,
+    }
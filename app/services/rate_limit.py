@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from app.services.metrics import Gauge
+from app.services.shared_cache import SharedCache, get_shared_cache
+
+# Request priorities, lower is served first
+PRIORITY_MUTATION = 0
+PRIORITY_SNAPSHOT = 1
+PRIORITY_HISTORY = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_MUTATION: "mutation",
+    PRIORITY_SNAPSHOT: "snapshot",
+    PRIORITY_HISTORY: "history",
+}
+
+# Request weight of the USD-M futures endpoints we call, keyed by (method, path); anything else weighs 1
+ENDPOINT_WEIGHTS: Dict[Tuple[str, str], int] = {
+    ("get", "account"): 5,
+    ("get", "allOrders"): 5,
+    ("get", "userTrades"): 5,
+    ("get", "income"): 30,
+    ("get", "positionRisk"): 5,
+    ("get", "positionSide/dual"): 30,
+    ("get", "exchangeInfo"): 1,
+    ("get", "leverageBracket"): 1,
+    ("get", "symbolConfig"): 5,
+    ("get", "premiumIndex"): 1,
+    ("get", "openOrders"): 1,
+}
+
+# Bulk history endpoints, scheduled behind everything else
+HISTORY_PATHS = {"allOrders", "userTrades", "income"}
+
+# Futures REST base URL override, e.g. a proxy or the local fake server in benchmarks/
+BINANCE_FUTURES_URL = os.getenv("BINANCE_FUTURES_URL")
+
+
+def endpoint_path(uri: str) -> str:
+    """
+    Futures endpoint path without the base URL and API version, e.g. "positionSide/dual".
+    """
+    return uri.split("/fapi/", 1)[-1].split("/", 1)[-1]
+
+
+def classify_request(method: str, uri: str, params: Optional[dict] = None) -> Tuple[int, int]:
+    """
+    Return (weight, priority) for an upstream request.
+    """
+    path = endpoint_path(uri)
+    weight = ENDPOINT_WEIGHTS.get((method, path), 1)
+    if path == "premiumIndex" and not (params or {}).get("symbol"):
+        # Unfiltered mark prices cover every symbol and cost more
+        weight = 10
+    if path == "openOrders" and not (params or {}).get("symbol"):
+        weight = 40
+    if method != "get":
+        return weight, PRIORITY_MUTATION
+    if path in HISTORY_PATHS:
+        return weight, PRIORITY_HISTORY
+    return weight, PRIORITY_SNAPSHOT
+
+
+class WeightScheduler:
+    """
+    Shared budget for Binance's per-IP request weight, with priority queueing.
+
+    Every upstream request reserves its endpoint weight against the current one-minute window
+    before it is sent. Each priority may only fill the window up to its share of the limit, so
+    bulk history fetches can never use up the headroom that mutations and account snapshots rely
+    on. Requests that do not fit wait in a priority queue until the next window. The
+    X-MBX-USED-WEIGHT-1M header on every response keeps the local estimate in line with what
+    Binance has counted, and a 429/418 with Retry-After pauses everything for that long.
+
+    Binance counts weight per IP, so with several workers on one host the budget is kept in
+    the shared cache's weight ledger (`ledger`) and every reservation is made against the
+    node-wide total. Queueing and priorities stay per process.
+    """
+
+    def __init__(self, limit: int = 2400, shares: Optional[Dict[int, float]] = None,
+                 ledger: Optional[SharedCache] = None):
+        self.limit = limit
+        self.shares = shares or {PRIORITY_MUTATION: 1.0, PRIORITY_SNAPSHOT: 0.9, PRIORITY_HISTORY: 0.7}
+        self.ledger = ledger
+        self._window = self._current_window()
+        self._used = 0
+        self._blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wakeup_at = 0.0
+
+    @staticmethod
+    def _current_window() -> int:
+        return int(time.time() // 60)
+
+    def _roll_window(self):
+        window = self._current_window()
+        if window != self._window:
+            self._window = window
+            self._used = 0
+
+    def _reserve(self, weight: int, priority: int) -> bool:
+        """
+        Reserve `weight` if it fits in the current window for this priority.
+        """
+        if time.time() < self._blocked_until:
+            return False
+        cap = self.limit * self.shares[priority]
+        if self.ledger is not None:
+            result = self.ledger.reserve_weight(self._window, weight, cap)
+            if result is not None:
+                reserved, self._used, blocked_until = result
+                self._blocked_until = max(self._blocked_until, blocked_until)
+                return reserved
+            # Ledger busy: decide from the last node-wide usage this worker saw
+        if self._used + weight > cap:
+            return False
+        self._used += weight
+        return True
+
+    def _dispatch(self):
+        self._roll_window()
+        while self._waiters:
+            priority, _, weight, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._reserve(weight, priority):
+                break
+            heapq.heappop(self._waiters)
+            future.set_result(None)
+        if self._waiters:
+            # Nothing else fits until the ban lifts or the next window opens
+            now = time.time()
+            wake_at = self._blocked_until if self._blocked_until > now else (self._window + 1) * 60
+            if self._wakeup is not None and self._wakeup_at <= wake_at:
+                return
+            if self._wakeup is not None:
+                self._wakeup.cancel()
+            self._wakeup_at = wake_at
+            self._wakeup = asyncio.get_running_loop().call_later(max(wake_at - now, 0.01), self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    async def acquire(self, weight: int, priority: int):
+        """
+        Wait until `weight` fits in the current window for this priority, then reserve it.
+        """
+        self._roll_window()
+        if not self._waiters and self._reserve(weight, priority):
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), weight, future))
+        # A higher-priority request may fit even while lower-priority ones are waiting
+        self._dispatch()
+        await future
+
+    def observe(self, status: int, headers) -> None:
+        """
+        Reconcile the local budget with the weight Binance reports, and back off when told to.
+        """
+        self._roll_window()
+        used = headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            self._used = max(self._used, int(used))
+        if status in (418, 429):
+            retry_after = int(headers.get("Retry-After", 60))
+            self._blocked_until = max(self._blocked_until, time.time() + retry_after)
+        if self.ledger is not None and (used is not None or status in (418, 429)):
+            self.ledger.observe_weight(self._window, self._used, self._blocked_until)
+
+    def stats(self) -> dict:
+        self._roll_window()
+        if self.ledger is not None:
+            used, blocked_until = self.ledger.weight_usage(self._window)
+            self._used = max(self._used, used)
+            self._blocked_until = max(self._blocked_until, blocked_until)
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES[priority]] += 1
+        return {
+            "weight_limit": self.limit,
+            "weight_used": self._used,
+            "weight_remaining": max(self.limit - self._used, 0),
+            "queue_depth": sum(queued.values()),
+            "queued": queued,
+            "blocked_for": max(self._blocked_until - time.time(), 0),
+        }
+
+
+_scheduler: Optional[WeightScheduler] = None
+
+
+def get_scheduler() -> WeightScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = WeightScheduler(
+            limit=int(os.getenv("BINANCE_WEIGHT_LIMIT", "2400")),
+            shares={
+                PRIORITY_MUTATION: 1.0,
+                PRIORITY_SNAPSHOT: float(os.getenv("BINANCE_SNAPSHOT_WEIGHT_SHARE", "0.9")),
+                PRIORITY_HISTORY: float(os.getenv("BINANCE_HISTORY_WEIGHT_SHARE", "0.7")),
+            },
+            ledger=get_shared_cache(),
+        )
+    return _scheduler
+
+
+def _scheduler_gauge(field: str):
+    return lambda: {(): get_scheduler().stats()[field]}
+
+
+Gauge("binance_weight_limit", "Request weight allowed per one-minute window", _scheduler_gauge("weight_limit"))
+Gauge("binance_weight_used", "Request weight used in the current one-minute window", _scheduler_gauge("weight_used"))
+Gauge("binance_weight_blocked_seconds", "Seconds until a 429/418 back-off lifts", _scheduler_gauge("blocked_for"))
+Gauge(
+    "binance_queued_requests", "Binance calls waiting for request-weight budget, by priority",
+    lambda: {(name,): count for name, count in get_scheduler().stats()["queued"].items()}, ("priority",),
+)
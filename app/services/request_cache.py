@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+import ujson
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from app.services.metrics import REQUEST_CACHE_REQUESTS
+from app.services.shared_cache import get_shared_cache
+
+# (credential hash, endpoint, params)
+CacheKey = Tuple[str, str, Hashable]
+
+
+def shared_key(credential: str, endpoint: str, params: Hashable = None) -> str:
+    """
+    SharedCache key for a RequestCache key; without params, the prefix shared by all of an endpoint's keys.
+    """
+    prefix = f"{credential}:{endpoint}:"
+    return prefix if params is None else prefix + ujson.dumps(params)
+
+
+class RequestCache:
+    """
+    Single-flight coalescing plus a short TTL cache for read-only upstream calls.
+
+    Concurrent callers with the same key share one in-flight upstream request, and its result
+    is served from memory for `ttl` seconds afterwards. The upstream request runs in its own
+    task, so a caller that disconnects does not cancel it for the others. Mutations call
+    `invalidate`, which drops cached and in-flight entries for the affected endpoints and makes
+    sure a read that started before the mutation cannot repopulate the cache with stale data.
+
+    With the shared cache enabled, misses go through SharedCache.get_or_fetch, so one worker on
+    the node fetches and the others reuse its result. A local entry is then only served while
+    its credential's node-wide generation is unchanged, so a mutation made through any worker
+    is seen by all of them.
+    """
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (expires, value, node-wide generation when fetched or None)
+        self._values: Dict[CacheKey, Tuple[float, Any, Optional[int]]] = {}
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._generations: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _prune(self, now: float):
+        if len(self._values) < self.max_entries:
+            return
+        for key in [key for key, (expires, _, _) in self._values.items() if expires <= now]:
+            del self._values[key]
+        while len(self._values) >= self.max_entries:
+            del self._values[next(iter(self._values))]
+
+    async def get_or_fetch(self, key: CacheKey, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float] = None,
+                           shared: bool = True):
+        """
+        Cached or coalesced result of `fetch` for `key`. Pass shared=False for values that are not
+        JSON-serializable or only meaningful in this process; they are cached locally only.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        shared_cache = get_shared_cache() if shared else None
+        now = time.monotonic()
+        cached = self._values.get(key)
+        if cached is not None and cached[0] > now and (
+            cached[2] is None or cached[2] == shared_cache.generation(key[0])
+        ):
+            self.hits += 1
+            REQUEST_CACHE_REQUESTS.inc(key[1], "hit")
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            REQUEST_CACHE_REQUESTS.inc(key[1], "miss")
+            generation = self._generations.get(key[0], 0)
+            if shared_cache is not None:
+                shared_generation = shared_cache.generation(key[0])
+                task = self._inflight[key] = asyncio.ensure_future(
+                    shared_cache.get_or_fetch(shared_key(*key), fetch, ttl, credential=key[0])
+                )
+            else:
+                shared_generation = None
+                task = self._inflight[key] = asyncio.ensure_future(fetch())
+
+            def done(task: asyncio.Task):
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                if task.cancelled() or task.exception() is not None:
+                    return
+                if self._generations.get(key[0], 0) == generation:
+                    finished = time.monotonic()
+                    self._prune(finished)
+                    self._values[key] = (finished + ttl, task.result(), shared_generation)
+
+            task.add_done_callback(done)
+        else:
+            self.hits += 1
+            REQUEST_CACHE_REQUESTS.inc(key[1], "hit")
+        return await asyncio.shield(task)
+
+    def invalidate(self, credential: str, endpoints: Iterable[str]):
+        endpoints = set(endpoints)
+        self._generations[credential] = self._generations.get(credential, 0) + 1
+        for entries in (self._values, self._inflight):
+            for key in [key for key in entries if key[0] == credential and key[1] in endpoints]:
+                del entries[key]
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            shared_cache.invalidate(credential, [shared_key(credential, endpoint) for endpoint in endpoints])
+
+
+_cache: Optional[RequestCache] = None
+
+
+def get_request_cache() -> RequestCache:
+    global _cache
+    if _cache is None:
+        _cache = RequestCache(
+            ttl=float(os.getenv("REQUEST_CACHE_TTL", "1.0")),
+            max_entries=int(os.getenv("REQUEST_CACHE_MAX_ENTRIES", "10000")),
+        )
+    return _cache
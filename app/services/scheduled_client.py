@@ -0,0 +1,42 @@
+import time
+from binance import AsyncClient
+from app.services.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_WEIGHT, UPSTREAM_WEIGHT_WAIT_SECONDS
+from app.services.rate_limit import (
+    BINANCE_FUTURES_URL, PRIORITY_NAMES, classify_request, endpoint_path, get_scheduler,
+)
+
+# python-binance pulls in dateparser and friends, so this module is only imported once a client
+# is actually needed (see ClientPool._new_client and ExchangeInfoCache._download)
+
+
+class ScheduledAsyncClient(AsyncClient):
+    """
+    AsyncClient whose requests all go through the shared WeightScheduler.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if BINANCE_FUTURES_URL:
+            self.FUTURES_URL = BINANCE_FUTURES_URL
+
+    async def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        scheduler = get_scheduler()
+        weight, priority = classify_request(method, uri, kwargs.get("data"))
+        priority_name = PRIORITY_NAMES[priority]
+        queued_at = time.perf_counter()
+        await scheduler.acquire(weight, priority)
+        started_at = time.perf_counter()
+        UPSTREAM_WEIGHT_WAIT_SECONDS.observe(started_at - queued_at, priority_name)
+        UPSTREAM_WEIGHT.inc(priority_name, amount=weight)
+
+        status = "error"
+        try:
+            # Sign only once the request is allowed out, so queued requests do not go stale
+            kwargs = self._get_request_kwargs(method, signed, force_params, **kwargs)
+            async with getattr(self.session, method)(uri, proxy=self.https_proxy, **kwargs) as response:
+                self.response = response
+                status = str(response.status)
+                scheduler.observe(response.status, response.headers)
+                return await self._handle_response(response)
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started_at, method, endpoint_path(uri), status)
@@ -0,0 +1,344 @@
+import asyncio
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+import ujson
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple
+from app.services.metrics import SHARED_CACHE_BUSY, SHARED_CACHE_REQUESTS
+
+# Share caches and the request-weight budget between worker processes on this host
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "false").lower() == "true"
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "data/shared_cache.sqlite3")
+# How long a worker may hold a fetch lease before others stop waiting for it, and how often they check
+SHARED_CACHE_LEASE_TTL = float(os.getenv("SHARED_CACHE_LEASE_TTL", "30"))
+SHARED_CACHE_POLL_INTERVAL = float(os.getenv("SHARED_CACHE_POLL_INTERVAL", "0.02"))
+# Longest an event-loop call waits for another worker's write lock before falling back to local behaviour
+SHARED_CACHE_BUSY_TIMEOUT = float(os.getenv("SHARED_CACHE_BUSY_TIMEOUT", "0.05"))
+# How often expired entries and leases are deleted from the database
+SHARED_CACHE_PURGE_INTERVAL = float(os.getenv("SHARED_CACHE_PURGE_INTERVAL", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    expires REAL NOT NULL,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS generations (
+    credential TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS weight (
+    window INTEGER PRIMARY KEY,
+    used INTEGER NOT NULL,
+    blocked_until REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+    """
+    Node-wide cache and request-weight ledger, in one SQLite database (WAL) used by every worker.
+
+    `get_or_fetch` gives cross-process single flight: the first worker to miss takes a lease on
+    the key and fetches, the others poll until the value lands (or the lease expires and one
+    of them takes over). Values are stored as JSON with wall-clock expiry, since monotonic
+    clocks are not comparable between processes. Per-credential generations play the same
+    role as in RequestCache: an invalidation in any worker stops reads that started before it
+    from storing their result.
+
+    Order history is not cached here; with several workers it is shared through the order store
+    (ORDER_STORE_ENABLED, which deploy.sh turns on alongside this cache).
+
+    The weight ledger holds one row per one-minute window, so WeightScheduler reservations
+    count against what the whole node has sent, and a 429/418 back-off seen by one worker
+    pauses all of them.
+
+    Every statement touches a row or two of a local file, so calls are made directly from
+    the event loop; a thread hop would cost more than the query. To keep another worker's
+    write lock from stalling the loop, the connection only waits SHARED_CACHE_BUSY_TIMEOUT for
+    it. After that each call degrades instead of blocking:
+    - reads miss;
+    - writes and leases are skipped (the value is then fetched locally);
+    - weight reservations fall back to the scheduler's own count.
+
+    Invalidations are the exception: they are retried in a thread with a longer timeout rather
+    than dropped. Expired entries and leases are purged on write every SHARED_CACHE_PURGE_INTERVAL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Set-up may wait for other workers doing the same; after that, waits are kept short
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(SHARED_CACHE_BUSY_TIMEOUT * 1000)}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: Iterable = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, tuple(params))
+
+    @staticmethod
+    def _busy(operation: str, e: sqlite3.OperationalError):
+        SHARED_CACHE_BUSY.inc(operation)
+        print(f"Shared cache busy ({operation}): {str(e)}")
+
+    def _purge(self, now: float):
+        if now < self._next_purge:
+            return
+        self._next_purge = now + SHARED_CACHE_PURGE_INTERVAL
+        self._execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        self._execute("DELETE FROM leases WHERE expires <= ?", (now,))
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        (found, value) for an unexpired entry, optionally stored no more than `max_age` seconds ago.
+        """
+        now = time.time()
+        oldest = now - max_age if max_age is not None else 0.0
+        try:
+            row = self._execute(
+                "SELECT value FROM entries WHERE key = ? AND expires > ? AND stored_at >= ?", (key, now, oldest)
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            self._busy("get", e)
+            return False, None
+        return (True, ujson.loads(row[0])) if row is not None else (False, None)
+
+    def set(self, key: str, value: Any, ttl: float, credential: Optional[str] = None,
+            generation: Optional[int] = None):
+        """
+        Store a value, unless `credential` has been invalidated since `generation` was read.
+        """
+        now = time.time()
+        data = ujson.dumps(value)
+        try:
+            if credential is None:
+                self._execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, now, now + ttl, data))
+            else:
+                self._execute(
+                    "INSERT OR REPLACE INTO entries SELECT ?, ?, ?, ? "
+                    "WHERE COALESCE((SELECT generation FROM generations WHERE credential = ?), 0) = ?",
+                    (key, now, now + ttl, data, credential, generation or 0),
+                )
+            self._purge(now)
+        except sqlite3.OperationalError as e:
+            self._busy("set", e)
+
+    def generation(self, credential: str) -> int:
+        """
+        The credential's invalidation count, or -1 when the database is busy. -1 matches no stored
+        generation, so local copies are treated as stale and nothing is stored under it.
+        """
+        try:
+            row = self._execute("SELECT generation FROM generations WHERE credential = ?", (credential,)).fetchone()
+        except sqlite3.OperationalError as e:
+            self._busy("generation", e)
+            return -1
+        return row[0] if row is not None else 0
+
+    def invalidate(self, credential: str, prefixes: Iterable[str]):
+        """
+        Bump the credential's generation and drop every entry whose key starts with one of `prefixes`.
+        """
+        prefixes = list(prefixes)
+        try:
+            with self._lock:
+                self._invalidate(self._conn, credential, prefixes)
+        except sqlite3.OperationalError as e:
+            # Dropping an invalidation would leave other workers serving stale data, so retry it
+            # off the event loop on a connection that may wait
+            self._busy("invalidate", e)
+            asyncio.get_running_loop().run_in_executor(None, self._invalidate_blocking, credential, prefixes)
+
+    @staticmethod
+    def _invalidate(conn: sqlite3.Connection, credential: str, prefixes: List[str]):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO generations VALUES (?, 1) ON CONFLICT (credential) DO UPDATE SET generation = generation + 1",
+                (credential,),
+            )
+            conn.executemany(
+                "DELETE FROM entries WHERE substr(key, 1, length(?1)) = ?1", [(prefix,) for prefix in prefixes]
+            )
+
+    def _invalidate_blocking(self, credential: str, prefixes: List[str]):
+        conn = sqlite3.connect(self.path, isolation_level=None, timeout=30.0)
+        try:
+            self._invalidate(conn, credential, prefixes)
+        except sqlite3.OperationalError as e:
+            print(f"Error invalidating shared cache: {str(e)}")
+        finally:
+            conn.close()
+
+    def _try_lease(self, key: str, ttl: float) -> Optional[bool]:
+        """
+        Whether this worker now holds the fetch lease for `key`, or None when the database is busy.
+        """
+        now = time.time()
+        try:
+            cursor = self._execute(
+                "INSERT INTO leases VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires <= ?",
+                (key, self.owner, now + ttl, now),
+            )
+        except sqlite3.OperationalError as e:
+            self._busy("lease", e)
+            return None
+        return cursor.rowcount == 1
+
+    def _release(self, key: str):
+        try:
+            self._execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        except sqlite3.OperationalError as e:
+            # The lease runs out on its own
+            self._busy("release", e)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: float,
+                           max_age: Optional[float] = None, credential: Optional[str] = None) -> Any:
+        """
+        Return the node-wide cached value for `key`, calling `fetch` in at most one worker at a time.
+        """
+        waited = False
+        while True:
+            found, value = self.get(key, max_age)
+            if found:
+                SHARED_CACHE_REQUESTS.inc("wait" if waited else "hit")
+                return value
+            leased = self._try_lease(key, SHARED_CACHE_LEASE_TTL)
+            if leased is None:
+                # Busy: fetch here rather than keep polling a locked database
+                SHARED_CACHE_REQUESTS.inc("fetch")
+                return await fetch()
+            if leased:
+                break
+            # Another worker is fetching the same key
+            waited = True
+            await asyncio.sleep(SHARED_CACHE_POLL_INTERVAL)
+
+        SHARED_CACHE_REQUESTS.inc("fetch")
+        try:
+            generation = self.generation(credential) if credential is not None else None
+            value = await fetch()
+            self.set(key, value, ttl, credential, generation)
+            return value
+        finally:
+            self._release(key)
+
+    def reserve_weight(self, window: int, weight: int, cap: float) -> Optional[Tuple[bool, int, float]]:
+        """
+        Add `weight` to the node's usage for `window` if it stays within `cap` and no back-off is
+        in force. Returns (reserved, used, blocked_until) as seen after the attempt, or None when
+        the database is busy and the caller should decide from its own count.
+        """
+        try:
+            return self._reserve_weight(window, weight, cap)
+        except sqlite3.OperationalError as e:
+            self._busy("reserve_weight", e)
+            return None
+
+    def _reserve_weight(self, window: int, weight: int, cap: float) -> Tuple[bool, int, float]:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("INSERT OR IGNORE INTO weight VALUES (?, 0, 0)", (window,))
+            reserved = self._conn.execute(
+                "UPDATE weight SET used = used + ? WHERE window = ? AND used + ? <= ? "
+                "AND (SELECT MAX(blocked_until) FROM weight) <= ?",
+                (weight, window, weight, cap, now),
+            ).rowcount == 1
+            used, blocked_until = self._conn.execute(
+                "SELECT used, (SELECT MAX(blocked_until) FROM weight) FROM weight WHERE window = ?", (window,)
+            ).fetchone()
+            # Old windows only matter for their back-off, and that is carried by the newest row
+            self._conn.execute("DELETE FROM weight WHERE window < ? AND blocked_until <= ?", (window - 1, now))
+        return reserved, used, blocked_until
+
+    def observe_weight(self, window: int, used: int, blocked_until: float):
+        """
+        Raise the node's usage for `window` to what Binance reported, and record any back-off.
+        """
+        try:
+            self._execute(
+                "INSERT INTO weight VALUES (?, ?, ?) ON CONFLICT (window) DO UPDATE SET "
+                "used = MAX(used, excluded.used), blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                (window, used, blocked_until),
+            )
+        except sqlite3.OperationalError as e:
+            # The next response reports the usage again
+            self._busy("observe_weight", e)
+
+    def weight_usage(self, window: int) -> Tuple[int, float]:
+        try:
+            row = self._execute(
+                "SELECT COALESCE((SELECT used FROM weight WHERE window = ?), 0), "
+                "COALESCE((SELECT MAX(blocked_until) FROM weight), 0)",
+                (window,),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            self._busy("weight_usage", e)
+            return 0, 0.0
+        return row[0], row[1]
+
+
+@asynccontextmanager
+async def node_lock(path: str) -> AsyncIterator[None]:
+    """
+    Exclusive lock on `path` across worker processes, waited for without blocking the event loop.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                await asyncio.sleep(SHARED_CACHE_POLL_INTERVAL)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+_cache: Optional[SharedCache] = None
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    The node-wide cache, or None when SHARED_CACHE_ENABLED is off (single-process mode).
+    """
+    global _cache
+    if _cache is None and SHARED_CACHE_ENABLED:
+        _cache = SharedCache(SHARED_CACHE_PATH)
+    return _cache
+
+
+def close_shared_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
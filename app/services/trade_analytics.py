@@ -0,0 +1,167 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+SIDES = ("BUY", "SELL")
+
+
+def _encode(values: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Dictionary-encode strings: (distinct values in order of first appearance, code per value).
+    """
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.intp, count=len(values))
+    return list(index), codes
+
+
+class TradeColumns:
+    """
+    Fills packed into parallel NumPy arrays, sorted by time.
+
+    Strings are parsed once while packing: symbols and commission assets become small integer
+    codes into the `symbols`/`assets` lists, sides become 0 (BUY) / 1 (SELL), and every numeric field is
+    float64. Everything after packing is vectorized.
+    """
+
+    def __init__(self, trades: List[dict], margin_assets: Optional[Dict[str, str]] = None):
+        n = len(trades)
+        time = np.fromiter((t["time"] for t in trades), dtype=np.int64, count=n)
+        order = np.argsort(time, kind="stable")
+        self.time = time[order]
+        self.symbols, self.symbol = _encode([t["symbol"] for t in trades])
+        self.symbol = self.symbol[order]
+        self.order_id = np.fromiter((t["orderId"] for t in trades), dtype=np.int64, count=n)[order]
+        self.side = np.fromiter((t["side"] == "SELL" for t in trades), dtype=np.int8, count=n)[order]
+        self.maker = np.fromiter((bool(t.get("maker")) for t in trades), dtype=bool, count=n)[order]
+        self.qty = np.array([t.get("qty", 0) for t in trades], dtype=np.float64)[order]
+        self.quote_qty = np.array([t.get("quoteQty", 0) for t in trades], dtype=np.float64)[order]
+        self.realized_pnl = np.array([t.get("realizedPnl", 0) for t in trades], dtype=np.float64)[order]
+        self.commission = np.array([t.get("commission", 0) for t in trades], dtype=np.float64)[order]
+        self.assets, self.asset = _encode([t.get("commissionAsset") or "" for t in trades])
+        self.asset = self.asset[order]
+
+        # Fees paid in another asset (e.g. BNB) cannot be netted against PnL in the margin asset
+        margin_assets = margin_assets or {}
+        fee_in_margin = np.array([
+            [not margin_assets.get(symbol) or margin_assets[symbol] == asset for asset in self.assets]
+            for symbol in self.symbols
+        ], dtype=bool).reshape(len(self.symbols), len(self.assets))
+        self.fee = np.where(fee_in_margin[self.symbol, self.asset], self.commission, 0.0)
+        self.net_pnl = self.realized_pnl - self.fee
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+def _sum_by(codes: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    return np.bincount(codes, weights=values, minlength=size)
+
+
+def _none_if_nan(value):
+    return None if value != value else value
+
+
+def _win_stats(order_pnl: np.ndarray) -> Dict[str, Any]:
+    closed = order_pnl != 0
+    wins = order_pnl > 0
+    gross_profit = float(order_pnl[wins].sum())
+    gross_loss = float(-order_pnl[closed & ~wins].sum())
+    closed_count = int(closed.sum())
+    win_count = int(wins.sum())
+    return {
+        "closingOrders": closed_count,
+        "winRate": win_count / closed_count if closed_count else None,
+        "avgWin": gross_profit / win_count if win_count else None,
+        "avgLoss": gross_loss / (closed_count - win_count) if closed_count > win_count else None,
+        "profitFactor": gross_profit / gross_loss if gross_loss else None,
+    }
+
+
+def _groups(columns: TradeColumns, codes: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+    return {
+        "fills": np.bincount(codes, minlength=size),
+        "volume": _sum_by(codes, columns.quote_qty, size),
+        "realizedPnl": _sum_by(codes, columns.realized_pnl, size),
+        "commission": _sum_by(codes, columns.fee, size),
+        "netPnl": _sum_by(codes, columns.net_pnl, size),
+    }
+
+
+def analyze_trades(columns: TradeColumns) -> Dict[str, Any]:
+    """
+    Aggregate fills by symbol, UTC day and side, plus win/loss statistics, the equity curve and drawdown.
+
+    Win rate and the related figures count orders rather than fills: all fills of an order are
+    summed first, and an order with non-zero realized PnL counts as one closing trade. The
+    equity curve is cumulative net PnL (realized PnL less fees paid in the margin asset), one
+    point per day, closing at the day's last fill. Drawdown is measured fill by fill.
+    """
+    n = len(columns)
+    if n == 0:
+        return {"summary": {"fills": 0}, "bySymbol": {}, "bySide": {}, "daily": {}, "drawdown": None}
+
+    # An order's fills share (symbol, orderId); order ids are only unique per symbol
+    symbol_count = len(columns.symbols)
+    order_keys, order_codes = np.unique(columns.order_id * symbol_count + columns.symbol, return_inverse=True)
+    order_codes = order_codes.reshape(-1)
+    order_pnl = _sum_by(order_codes, columns.realized_pnl, len(order_keys))
+    order_symbol = order_keys % symbol_count
+
+    summary = {name: values[0] for name, values in _groups(columns, np.zeros(n, dtype=np.intp), 1).items()}
+    summary["orders"] = len(order_keys)
+    summary["makerFills"] = int(columns.maker.sum())
+    summary["commissionByAsset"] = dict(zip(
+        columns.assets, _sum_by(columns.asset, columns.commission, len(columns.assets)).tolist()
+    ))
+    summary.update(_win_stats(order_pnl))
+
+    by_symbol = _groups(columns, columns.symbol, symbol_count)
+    by_symbol["orders"] = np.bincount(order_symbol, minlength=symbol_count)
+    closed = order_pnl != 0
+    closed_by_symbol = np.bincount(order_symbol, weights=closed, minlength=symbol_count)
+    wins_by_symbol = np.bincount(order_symbol, weights=order_pnl > 0, minlength=symbol_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        by_symbol["winRate"] = np.where(closed_by_symbol > 0, wins_by_symbol / closed_by_symbol, np.nan)
+
+    by_side = _groups(columns, columns.side.astype(np.intp), len(SIDES))
+
+    equity = np.cumsum(columns.net_pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    drawdown = peak - equity
+    trough = int(np.argmax(drawdown))
+    # No peak index means the drawdown runs from the starting (zero) equity
+    peak_index = int(np.argmax(equity[:trough + 1])) if equity[:trough + 1].max() > 0 else None
+    has_drawdown = drawdown[trough] > 0
+
+    days, day_codes = np.unique(columns.time // DAY_MS, return_inverse=True)
+    day_codes = day_codes.reshape(-1)
+    daily = _groups(columns, day_codes, len(days))
+    # Fills are time-sorted, so each day's last fill is where the next day's codes start
+    day_close = np.append(np.flatnonzero(np.diff(day_codes)), n - 1)
+    daily["equity"] = equity[day_close]
+    daily["drawdown"] = drawdown[day_close]
+
+    def rows(groups: Dict[str, np.ndarray], labels: List[str]) -> Dict[str, Dict[str, Any]]:
+        lists = {name: values.tolist() for name, values in groups.items()}
+        return {
+            label: {name: _none_if_nan(values[i]) for name, values in lists.items()}
+            for i, label in enumerate(labels)
+            if lists["fills"][i]
+        }
+
+    return {
+        "summary": {name: (value.item() if isinstance(value, np.generic) else value) for name, value in summary.items()},
+        "bySymbol": rows(by_symbol, columns.symbols),
+        "bySide": rows(by_side, list(SIDES)),
+        "daily": {
+            "date": days.astype("datetime64[D]").astype(str).tolist(),
+            **{name: values.tolist() for name, values in daily.items()},
+        },
+        "drawdown": {
+            "maxDrawdown": float(drawdown[trough]),
+            "peakTime": int(columns.time[peak_index]) if has_drawdown and peak_index is not None else None,
+            "troughTime": int(columns.time[trough]) if has_drawdown else None,
+            "currentDrawdown": float(drawdown[-1]),
+        },
+    }
@@ -0,0 +1,134 @@
+import asyncio
+import importlib
+import os
+import time
+import ujson
+from typing import Any, Awaitable, Dict, List, Optional
+from app.services.client_pool import get_client_pool
+from app.services.exchange_info import get_exchange_info_cache
+
+# JSON file of accounts to warm up: {"<name>": {"api_key": "...", "api_secret": "..."}}. Only read
+# at startup, never exposed over HTTP; keep it out of version control (/.keys/ is git-ignored)
+WARMUP_ACCOUNTS_FILE = os.getenv("WARMUP_ACCOUNTS_FILE", ".keys/accounts.json")
+# Report ready after this many seconds even if warm-up steps are still running
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+
+# Modules the request paths import on first use; loading them here keeps that cost off the first requests
+WARMUP_MODULES = (
+    "app.services.scheduled_client",
+    "app.services.order_columns",
+    "app.services.trade_analytics",
+    "app.services.live_pnl",
+)
+
+
+def _warmup_accounts() -> List[Dict[str, str]]:
+    try:
+        with open(WARMUP_ACCOUNTS_FILE) as f:
+            return list(ujson.load(f).values())
+    except FileNotFoundError:
+        return []
+
+
+def _import_modules():
+    for module in WARMUP_MODULES:
+        importlib.import_module(module)
+
+
+class Warmup:
+    """
+    Start-up work that runs in the background once the worker is accepting connections.
+
+    The heavy modules are imported in the sync executor, then the exchange-info index is
+    loaded while every account in WARMUP_ACCOUNTS_FILE gets a warm pooled connection
+    and its leverage bracket tables. The worker counts as ready once all of this has finished,
+    or after WARMUP_TIMEOUT at the latest; unfinished steps keep running, and whatever failed
+    is simply loaded on first use instead.
+    """
+
+    def __init__(self, timeout: float = WARMUP_TIMEOUT):
+        self.timeout = timeout
+        self.steps: Dict[str, str] = {}
+        self._started_at = 0.0
+        self._finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._work: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._finished_at is not None
+
+    def start(self):
+        if self._task is None:
+            self._started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._work):
+            if task is not None:
+                task.cancel()
+        self._task = self._work = None
+
+    def stats(self) -> Dict[str, Any]:
+        finished_at = self._finished_at if self._finished_at is not None else time.monotonic()
+        return {
+            "ready": self.ready,
+            "elapsed": round(finished_at - self._started_at, 3) if self._started_at else 0.0,
+            "steps": dict(self.steps),
+        }
+
+    async def _step(self, name: str, work: Awaitable):
+        self.steps[name] = "running"
+        try:
+            await work
+            self.steps[name] = "ok"
+        except Exception as e:
+            print(f"Error warming up {name}: {str(e)}")
+            self.steps[name] = f"error: {str(e)}"
+
+    async def _exchange_info(self):
+        cache = get_exchange_info_cache()
+        # start() keeps going without the index, so check it actually loaded
+        await cache.start()
+        if not cache.loaded:
+            raise RuntimeError("exchange info is not loaded")
+
+    async def _accounts(self):
+        from app.services.binance import BinanceService
+
+        # Warming more accounts than the pool holds would only evict the first ones again
+        accounts = _warmup_accounts()[:get_client_pool().max_clients]
+        results = await asyncio.gather(
+            *[BinanceService.warm_up(account["api_key"], account["api_secret"]) for account in accounts],
+            return_exceptions=True,
+        )
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(accounts)} accounts failed, first: {str(failed[0])}")
+
+    async def _warm(self):
+        from app.services.binance import BinanceService
+
+        await self._step("imports", BinanceService.run_sync(_import_modules))
+        await asyncio.gather(
+            self._step("exchange_info", self._exchange_info()),
+            self._step("accounts", self._accounts()),
+        )
+
+    async def _run(self):
+        # Not cancelled on timeout: among other things it starts the exchange-info refresh loop
+        self._work = asyncio.create_task(self._warm())
+        done, _ = await asyncio.wait({self._work}, timeout=self.timeout)
+        if not done:
+            print(f"Warm-up did not finish within {self.timeout}s, reporting ready anyway")
+        self._finished_at = time.monotonic()
+
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
@@ -0,0 +1,332 @@
+"""
+Local stand-in for the Binance USD-M futures REST endpoints BinanceService calls.
+
+Serves deterministic synthetic payloads (or recorded ones from --replay), with configurable
+response latency and rate limiting: request weight is counted per minute like Binance does and
+reported in X-MBX-USED-WEIGHT-1M, requests past --weight-limit get a 429 with Retry-After, and
+--throttle-rate answers that fraction of requests with a 429 regardless. Signatures are not
+checked, so any API key and secret work.
+
+Point the service at it with BINANCE_FUTURES_URL=http://127.0.0.1:<port>/fapi.
+
+Usage: python -m benchmarks.fake_binance [--port 9010] [--latency 50] [--jitter 10]
+                                         [--throttle-rate 0] [--weight-limit 2400]
+                                         [--symbols 20] [--orders-per-day 50] [--replay DIR]
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import time
+import ujson
+from aiohttp import web
+from app.services.rate_limit import classify_request
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+BRACKETS = [
+    {"bracket": 1, "initialLeverage": 125, "notionalCap": 50000, "notionalFloor": 0, "maintMarginRatio": 0.004, "cum": 0.0},
+    {"bracket": 2, "initialLeverage": 100, "notionalCap": 250000, "notionalFloor": 50000, "maintMarginRatio": 0.005, "cum": 50.0},
+    {"bracket": 3, "initialLeverage": 50, "notionalCap": 3000000, "notionalFloor": 250000, "maintMarginRatio": 0.01, "cum": 1300.0},
+    {"bracket": 4, "initialLeverage": 20, "notionalCap": 20000000, "notionalFloor": 3000000, "maintMarginRatio": 0.025, "cum": 46300.0},
+]
+
+
+def _seed(*parts) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(parts).encode(), digest_size=8).digest(), "big")
+
+
+class FakeFutures:
+    """
+    Synthetic account state. History is a pure function of (symbol, time), so every window
+    fetch for the same range returns the same orders, as it would against the real API.
+    """
+
+    def __init__(self, symbols: int, orders_per_day: int, positions: int):
+        self.symbols = [f"SYM{i}USDT" for i in range(symbols)]
+        self.symbols[:2] = ["BTCUSDT", "ETHUSDT"][:symbols]
+        self.order_interval = DAY_MS // max(orders_per_day, 1)
+        self.positions = positions
+        self.leverage = {symbol: 20 for symbol in self.symbols}
+        self.dual_side = False
+        self.created = int(time.time() * 1000)
+
+    def _price(self, symbol: str) -> float:
+        return 10.0 + _seed(symbol) % 60000
+
+    def _order_times(self, symbol: str, start: int, end: int):
+        # Spread each symbol's orders on its own grid so symbols do not all trade at the same instant
+        offset = _seed(symbol) % self.order_interval
+        first = start - (start - offset) % self.order_interval
+        if first < start:
+            first += self.order_interval
+        return range(first, min(end, self.created) + 1, self.order_interval)
+
+    def _order(self, symbol: str, created: int) -> dict:
+        rng = random.Random(_seed(symbol, created))
+        price = self._price(symbol) * rng.uniform(0.95, 1.05)
+        qty = round(rng.uniform(0.001, 2), 3)
+        filled = rng.random() < 0.8
+        return {
+            "orderId": _seed(symbol, created) % 10 ** 11,
+            "symbol": symbol,
+            "status": "FILLED" if filled else "CANCELED",
+            "clientOrderId": f"web_{_seed('client', symbol, created):x}",
+            "price": "0" if filled else f"{price:.2f}",
+            "avgPrice": f"{price:.5f}" if filled else "0.00000",
+            "origQty": f"{qty:.3f}",
+            "executedQty": f"{qty:.3f}" if filled else "0",
+            "cumQuote": f"{price * qty:.5f}" if filled else "0",
+            "timeInForce": "GTC",
+            "type": "MARKET" if filled else "LIMIT",
+            "reduceOnly": False,
+            "closePosition": False,
+            "side": rng.choice(("BUY", "SELL")),
+            "positionSide": "BOTH",
+            "stopPrice": "0",
+            "workingType": "CONTRACT_PRICE",
+            "priceMatch": "NONE",
+            "selfTradePreventionMode": "NONE",
+            "goodTillDate": 0,
+            "priceProtect": False,
+            "origType": "MARKET" if filled else "LIMIT",
+            "time": created,
+            "updateTime": created + rng.randint(5, 500),
+        }
+
+    def all_orders(self, symbol: str, start: int, end: int, limit: int):
+        times = self._order_times(symbol, start, end)
+        return [self._order(symbol, created) for created in times[:limit]]
+
+    def user_trades(self, symbol: str, start: int, end: int, limit: int):
+        trades = []
+        for created in self._order_times(symbol, start - DAY_MS, end):
+            order = self._order(symbol, created)
+            if order["status"] != "FILLED" or not start <= order["updateTime"] <= end:
+                continue
+            rng = random.Random(_seed("trade", symbol, created))
+            trades.append({
+                "symbol": symbol,
+                "id": order["orderId"] * 10,
+                "orderId": order["orderId"],
+                "side": order["side"],
+                "price": order["avgPrice"],
+                "qty": order["executedQty"],
+                "realizedPnl": f"{rng.gauss(0, 15):.8f}",
+                "quoteQty": order["cumQuote"],
+                "commission": f"{float(order['cumQuote']) * 0.0004:.8f}",
+                "commissionAsset": "USDT",
+                "time": order["updateTime"],
+                "positionSide": "BOTH",
+                "buyer": order["side"] == "BUY",
+                "maker": rng.random() < 0.3,
+            })
+            if len(trades) == limit:
+                break
+        return trades
+
+    def income(self, start: int, end: int, limit: int):
+        income = []
+        for symbol in self.symbols:
+            for created in self._order_times(symbol, start, end)[:1]:
+                income.append({"symbol": symbol, "incomeType": "COMMISSION", "income": "-0.01",
+                               "asset": "USDT", "time": created, "info": "", "tranId": _seed(symbol, created) % 10 ** 12,
+                               "tradeId": ""})
+        return sorted(income, key=lambda item: item["time"])[:limit]
+
+    def position_risk(self):
+        positions = []
+        for i, symbol in enumerate(self.symbols):
+            amount = 0.5 if i < self.positions else 0.0
+            mark = self._price(symbol)
+            positions.append({
+                "symbol": symbol, "positionSide": "BOTH", "positionAmt": f"{amount}",
+                "entryPrice": f"{mark * 0.99:.2f}" if amount else "0.0", "breakEvenPrice": "0.0",
+                "markPrice": f"{mark:.2f}", "unRealizedProfit": f"{amount * mark * 0.01:.8f}",
+                "liquidationPrice": "0", "isolatedMargin": "0", "notional": f"{amount * mark:.8f}",
+                "marginAsset": "USDT", "isolatedWallet": "0", "initialMargin": f"{amount * mark / 20:.8f}",
+                "maintMargin": f"{amount * mark * 0.004:.8f}", "positionInitialMargin": f"{amount * mark / 20:.8f}",
+                "openOrderInitialMargin": "0", "adl": 0, "bidNotional": "0", "askNotional": "0",
+                "updateTime": self.created if amount else 0,
+            })
+        return positions
+
+    def account(self):
+        positions = []
+        for p in self.position_risk():
+            positions.append({
+                "symbol": p["symbol"], "initialMargin": p["initialMargin"], "maintMargin": p["maintMargin"],
+                "unrealizedProfit": p["unRealizedProfit"], "positionInitialMargin": p["positionInitialMargin"],
+                "openOrderInitialMargin": "0", "leverage": str(self.leverage[p["symbol"]]), "isolated": False,
+                "entryPrice": p["entryPrice"], "breakEvenPrice": p["breakEvenPrice"], "maxNotional": "250000",
+                "positionSide": "BOTH", "positionAmt": p["positionAmt"], "notional": p["notional"],
+                "isolatedWallet": "0", "updateTime": p["updateTime"], "bidNotional": "0", "askNotional": "0",
+            })
+        return {
+            "feeTier": 0, "canTrade": True, "canDeposit": True, "canWithdraw": True, "feeBurn": True,
+            "tradeGroupId": -1, "updateTime": 0, "multiAssetsMargin": False,
+            "totalInitialMargin": "100.00000000", "totalMaintMargin": "8.00000000",
+            "totalWalletBalance": "10000.00000000", "totalUnrealizedProfit": "12.50000000",
+            "totalMarginBalance": "10012.50000000", "totalPositionInitialMargin": "100.00000000",
+            "totalOpenOrderInitialMargin": "0.00000000", "totalCrossWalletBalance": "10000.00000000",
+            "totalCrossUnPnl": "12.50000000", "availableBalance": "9900.00000000",
+            "maxWithdrawAmount": "9900.00000000",
+            "assets": [{
+                "asset": asset, "walletBalance": balance, "unrealizedProfit": "0.00000000",
+                "marginBalance": balance, "maintMargin": "0.00000000", "initialMargin": "0.00000000",
+                "positionInitialMargin": "0.00000000", "openOrderInitialMargin": "0.00000000",
+                "maxWithdrawAmount": balance, "crossWalletBalance": balance, "crossUnPnl": "0.00000000",
+                "availableBalance": balance, "marginAvailable": True, "updateTime": self.created if used else 0,
+            } for asset, balance, used in (("USDT", "10000.00000000", True), ("BNB", "0.05000000", True),
+                                           ("USDC", "0.00000000", False))],
+            "positions": positions,
+        }
+
+    def exchange_info(self):
+        return {"timezone": "UTC", "serverTime": int(time.time() * 1000), "rateLimits": [], "symbols": [{
+            "symbol": symbol, "pair": symbol, "contractType": "PERPETUAL", "status": "TRADING",
+            "baseAsset": symbol[:-4], "quoteAsset": "USDT", "marginAsset": "USDT",
+            "pricePrecision": 2, "quantityPrecision": 3,
+            "filters": [{"filterType": "PRICE_FILTER", "tickSize": "0.10", "minPrice": "0.10", "maxPrice": "1000000"},
+                        {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"}],
+        } for symbol in self.symbols]}
+
+
+class FakeBinanceServer:
+    def __init__(self, state: FakeFutures, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 weight_limit: int = 2400, retry_after: int = 1, replay_dir: str = None):
+        self.state = state
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.weight_limit = weight_limit
+        self.retry_after = retry_after
+        self.replay_dir = replay_dir
+        self._window = 0
+        self._used = 0
+        self.requests = 0
+        self.throttled = 0
+
+    def _replayed(self, method: str, path: str):
+        """
+        A recorded payload for this endpoint, from <replay_dir>/<method>_<path with / as _>.json.
+        """
+        if not self.replay_dir:
+            return None
+        name = os.path.join(self.replay_dir, f"{method}_{path.replace('/', '_')}.json")
+        if not os.path.exists(name):
+            return None
+        with open(name) as f:
+            return ujson.load(f)
+
+    def _respond(self, payload, status: int = 200, headers=None):
+        return web.Response(text=ujson.dumps(payload), status=status, content_type="application/json",
+                            headers={"X-MBX-USED-WEIGHT-1M": str(self._used), **(headers or {})})
+
+    def _throttle(self):
+        self.throttled += 1
+        return self._respond({"code": -1003, "msg": "Too many requests; current limit is exceeded."}, status=429,
+                             headers={"Retry-After": str(self.retry_after)})
+
+    async def handle(self, request: web.Request):
+        self.requests += 1
+        method = request.method.lower()
+        version, path = request.match_info["version"], request.match_info["path"]
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0) / 1000)
+
+        window = int(time.time() // 60)
+        if window != self._window:
+            self._window, self._used = window, 0
+        weight, _ = classify_request(method, f"/fapi/{version}/{path}", params)
+        self._used += weight
+        if self._used > self.weight_limit or random.random() < self.throttle_rate:
+            return self._throttle()
+
+        replayed = self._replayed(method, path)
+        if replayed is not None:
+            return self._respond(replayed)
+
+        state = self.state
+        symbol = params.get("symbol")
+        start = int(params.get("startTime", 0))
+        end = int(params.get("endTime", time.time() * 1000))
+        limit = int(params.get("limit", 1000))
+        if path == "account":
+            return self._respond(state.account())
+        if path == "allOrders":
+            return self._respond(state.all_orders(symbol, start, end, limit))
+        if path == "userTrades":
+            return self._respond(state.user_trades(symbol, start, end, limit))
+        if path == "income":
+            return self._respond(state.income(start, end, limit))
+        if path == "openOrders":
+            return self._respond([])
+        if path == "positionRisk":
+            return self._respond([p for p in state.position_risk() if not symbol or p["symbol"] == symbol])
+        if path == "positionSide/dual":
+            if method == "post":
+                state.dual_side = params.get("dualSidePosition") == "true"
+                return self._respond({"code": 200, "msg": "success"})
+            return self._respond({"dualSidePosition": state.dual_side})
+        if path == "leverage":
+            state.leverage[symbol] = int(params["leverage"])
+            return self._respond({"symbol": symbol, "leverage": int(params["leverage"]), "maxNotionalValue": "250000"})
+        if path == "leverageBracket":
+            symbols = [symbol] if symbol else state.symbols
+            return self._respond([{"symbol": s, "notionalCoef": 1.0, "brackets": BRACKETS} for s in symbols])
+        if path == "symbolConfig":
+            symbols = [symbol] if symbol else state.symbols
+            return self._respond([{"symbol": s, "marginType": "CROSSED", "isAutoAddMargin": "false",
+                                   "leverage": state.leverage[s], "maxNotionalValue": "250000"} for s in symbols])
+        if path == "ping":
+            return self._respond({})
+        if path == "exchangeInfo":
+            return self._respond(state.exchange_info())
+        if path == "premiumIndex":
+            rows = [{"symbol": s, "markPrice": f"{state._price(s):.2f}", "time": int(time.time() * 1000)}
+                    for s in state.symbols if not symbol or s == symbol]
+            return self._respond(rows[0] if symbol else rows)
+        if path == "listenKey":
+            return self._respond({"listenKey": "fake-listen-key"} if method == "post" else {})
+        return self._respond({"code": -5000, "msg": f"Unsupported endpoint: {method.upper()} {path}"}, status=404)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/fapi/{version}/{path:.+}", self.handle)
+        return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9010)
+    parser.add_argument("--latency", type=float, default=50.0, help="Mean upstream latency in ms")
+    parser.add_argument("--jitter", type=float, default=10.0, help="Uniform latency jitter in ms")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--weight-limit", type=int, default=2400, help="Request weight allowed per minute")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--orders-per-day", type=int, default=50, help="Orders per symbol per day")
+    parser.add_argument("--positions", type=int, default=5, help="Symbols with an open position")
+    parser.add_argument("--replay", default=None, help="Directory of recorded payloads to serve instead")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    server = FakeBinanceServer(
+        FakeFutures(args.symbols, args.orders_per_day, args.positions),
+        latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate,
+        weight_limit=args.weight_limit, retry_after=args.retry_after, replay_dir=args.replay,
+    )
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Offline load test of the dashboard routes against benchmarks.fake_binance.
+
+Starts the fake futures server and the service (uvicorn, pointed at the fake through
+BINANCE_FUTURES_URL, with a throwaway order store) as subprocesses, then drives each route with
+a fixed number of concurrent clients and reports p50/p99 latency, requests/sec, error count and
+the service's resident memory. No real Binance access or keys are needed. A saved run can then
+serve as the baseline for later runs.
+
+--save writes the results as JSON. --compare checks them against a saved run and exits non-zero
+if any route's p50, p99 or throughput got worse than --tolerance allows, so it can gate a deploy.
+
+Usage: python -m benchmarks.load [--requests 200] [--concurrency 16] [--routes account,orders]
+                                 [--latency 50] [--throttle-rate 0] [--accounts 4] [--workers 1]
+                                 [--save results.json] [--compare baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+import ujson
+
+# (name, method, path, query params, JSON body)
+ROUTES = [
+    ("account", "get", "/get_futures_account", {}, None),
+    ("portfolio", "post", "/futures_portfolio", {},
+     [{"api_key": f"bench-key-{i}", "api_secret": f"bench-secret-{i}"} for i in range(8)]),
+    ("position_mode", "get", "/futures_get_position_mode", {}, None),
+    ("orders", "get", "/futures_get_all_orders", {"days": 30}, None),
+    ("orders_symbol", "get", "/futures_get_all_orders", {"symbol": "BTCUSDT", "days": 30}, None),
+    ("orders_ndjson", "get", "/futures_get_all_orders", {"days": 30, "stream": "ndjson"}, None),
+    ("analytics", "get", "/futures_trade_analytics", {"days": 30}, None),
+    ("change_leverage", "post", "/futures_change_leverage", {"symbol": "BTCUSDT", "leverage": 10}, None),
+    ("change_leverage_batch", "post", "/futures_change_leverage_batch", {},
+     [{"symbol": "BTCUSDT", "leverage": 10}, {"symbol": "ETHUSDT", "leverage": 5}]),
+    ("leverage", "get", "/futures_get_leverage", {}, None),
+    ("leverage_brackets", "get", "/futures_get_leverage_brackets", {"symbols": "BTCUSDT,ETHUSDT"}, None),
+    ("margin_requirements", "get", "/futures_get_margin_requirements", {"symbol": "BTCUSDT", "notional": 120000}, None),
+    ("rate_limit", "get", "/upstream_rate_limit", {}, None),
+    ("metrics", "get", "/metrics", {}, None),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_tree(pid: int):
+    """
+    A process and all its descendants (uvicorn workers), from /proc.
+    """
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_mb(pid: int):
+    """
+    Current and peak resident set size in MiB, summed over a process and its workers, from /proc
+    (None where unavailable).
+    """
+    rss = peak = 0
+    try:
+        for process in process_tree(pid):
+            with open(f"/proc/{process}/status") as f:
+                fields = dict(line.split(":", 1) for line in f if ":" in line)
+            rss += int(fields["VmRSS"].split()[0]) / 1024
+            peak += int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+    return rss, peak
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def wait_until_up(url: str, timeout: float = 30.0):
+    """
+    Poll `url` until it answers 200 (the service's /ready stays 503 while it warms up).
+    """
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout}s")
+            await asyncio.sleep(0.2)
+
+
+async def run_route(session: aiohttp.ClientSession, base_url: str, route, requests: int, concurrency: int,
+                    accounts: int, warmup: int) -> dict:
+    name, method, path, params, body = route
+    latencies = []
+    errors = 0
+    sent = 0
+
+    async def one(i: int):
+        nonlocal errors
+        headers = {"x-api-key": f"bench-key-{i % accounts}", "x-api-secret": f"bench-secret-{i % accounts}"}
+        start = time.perf_counter()
+        async with session.request(method, base_url + path, params=params, json=body, headers=headers) as response:
+            payload = await response.read()
+        elapsed = time.perf_counter() - start
+        # Routes report failures in-band as {"error": ...} with a 200
+        if response.status != 200 or payload[:9] == b'{"error":':
+            errors += 1
+        return elapsed
+
+    for i in range(warmup):
+        await one(i)
+
+    async def worker():
+        nonlocal sent
+        while sent < requests:
+            i = sent
+            sent += 1
+            latencies.append(await one(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "route": name,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else float("nan"),
+        "rps": requests / wall if wall else float("nan"),
+    }
+
+
+def compare(results, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = {row["route"]: row for row in ujson.load(f)["routes"]}
+    ok = True
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    for row in results:
+        base = baseline.get(row["route"])
+        if base is None:
+            continue
+        regressions = []
+        for key in ("p50_ms", "p99_ms"):
+            if row[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{key} {base[key]:.1f} -> {row[key]:.1f}")
+        if row["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"rps {base['rps']:.1f} -> {row['rps']:.1f}")
+        if regressions:
+            ok = False
+            print(f"  REGRESSION {row['route']}: {', '.join(regressions)}")
+    if ok:
+        print("  no regressions")
+    return ok
+
+
+async def run(args) -> int:
+    fake_port, app_port = free_port(), free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    store_dir = tempfile.mkdtemp(prefix="bench-orders-")
+    env = dict(os.environ, BINANCE_FUTURES_URL=f"{fake_url}/fapi", ORDER_STORE_DIR=store_dir,
+               ORDER_STORE_ENABLED="true" if args.order_store else "false",
+               BINANCE_WEIGHT_LIMIT=str(args.weight_limit),
+               SHARED_CACHE_ENABLED="true" if args.workers > 1 else "false",
+               SHARED_CACHE_PATH=os.path.join(store_dir, "shared_cache.sqlite3"))
+    fake = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_binance", "--port", str(fake_port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter), "--throttle-rate", str(args.throttle_rate),
+        "--weight-limit", str(args.weight_limit), "--symbols", str(args.symbols),
+        "--orders-per-day", str(args.orders_per_day),
+    ] + (["--replay", args.replay] if args.replay else []))
+    app = None
+    try:
+        await wait_until_up(f"{fake_url}/fapi/v1/exchangeInfo")
+        app = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "trading_dashboard:app", "--port", str(app_port), "--log-level", "warning",
+             "--workers", str(args.workers)],
+            # Keep route output (print logging) out of the results table; errors still reach stderr
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        await wait_until_up(f"{app_url}/ready")
+
+        selected = set(args.routes.split(",")) if args.routes else None
+        routes = [route for route in ROUTES if selected is None or route[0] in selected]
+        results = []
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        print(f"{args.requests} requests per route, concurrency {args.concurrency}, {args.accounts} account(s), "
+              f"{args.workers} worker(s), "
+              f"upstream latency {args.latency}±{args.jitter} ms, throttle rate {args.throttle_rate}")
+        print(f"  {'route':<24}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'req/s':>9}{'errors':>8}{'rss MiB':>9}{'peak':>7}")
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            for route in routes:
+                row = await run_route(session, app_url, route, args.requests, args.concurrency,
+                                      args.accounts, args.warmup)
+                row["rss_mb"], row["peak_rss_mb"] = rss_mb(app.pid)
+                results.append(row)
+                rss = f"{row['rss_mb']:9.1f}{row['peak_rss_mb']:7.1f}" if row["rss_mb"] is not None else f"{'n/a':>9}{'':>7}"
+                print(f"  {row['route']:<24}{row['p50_ms']:9.1f}{row['p99_ms']:9.1f}{row['max_ms']:9.1f}"
+                      f"{row['rps']:9.1f}{row['errors']:8d}{rss}")
+    finally:
+        for process in (app, fake):
+            if process is not None:
+                process.terminate()
+                process.wait()
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            ujson.dump({"args": vars(args), "routes": results}, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per route before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--accounts", type=int, default=4, help="Distinct API key pairs to spread requests over")
+    parser.add_argument("--routes", default=None, help=f"Comma-separated subset of: {','.join(r[0] for r in ROUTES)}")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Uvicorn worker processes; more than one enables the shared cache")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--no-order-store", dest="order_store", action="store_false",
+                        help="Run with ORDER_STORE_ENABLED=false (every history request goes upstream)")
+    parser.add_argument("--latency", type=float, default=50.0, help="Fake upstream latency in ms")
+    parser.add_argument("--jitter", type=float, default=10.0, help="Fake upstream latency jitter in ms")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of upstream requests answered 429")
+    parser.add_argument("--weight-limit", type=int, default=1000000,
+                        help="Upstream weight limit per minute, for both the fake and the service's scheduler. "
+                             "The default is high enough to measure the service itself; use 2400 to see "
+                             "real-world queueing")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--orders-per-day", type=int, default=50)
+    parser.add_argument("--replay", default=None, help="Directory of recorded upstream payloads")
+    parser.add_argument("--save", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression for --compare")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
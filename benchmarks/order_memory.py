@@ -0,0 +1,129 @@
+"""
+Memory held by an account's order history: enriched dicts of strings, as get_all_orders used to
+keep them, against app.services.order_columns.OrderColumns.
+
+Both layouts are built from the same JSON-decoded upstream records, the way the order store
+loads them, and measured with tracemalloc. Also reports the CPU cost of building each layout
+and of producing response dicts from OrderColumns, and checks that those match the dict layout,
+including decimals beyond float64 precision and fields set to null.
+
+Usage: python -m benchmarks.order_memory [--orders 100000] [--symbols 50]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from app.models.futures import FuturesOrdersResponse
+from app.services.order_columns import OrderColumns, total_trades
+
+
+def make_history(count: int, symbols: int):
+    example = dict(FuturesOrdersResponse.model_config["json_schema_extra"]["example"]["orders"][0])
+    for field in ("timeReadable", "updateTimeReadable", "realizedPnl", "commission", "commissionAsset"):
+        example.pop(field, None)
+    orders, trades = [], []
+    for i in range(count):
+        order = dict(example)
+        order["orderId"] = example["orderId"] + i
+        order["symbol"] = f"SYM{i % symbols}USDT"
+        order["clientOrderId"] = f"web_{random.getrandbits(64):x}"
+        order["price"] = f"{random.uniform(0.1, 70000):.2f}"
+        order["avgPrice"] = f"{random.uniform(0.1, 70000):.5f}"
+        order["origQty"] = f"{random.uniform(0.001, 100):.3f}"
+        order["executedQty"] = order["origQty"]
+        order["cumQuote"] = f"{random.uniform(1, 10000):.5f}"
+        order["side"] = random.choice(("BUY", "SELL"))
+        order["time"] = example["time"] - i * 60000
+        order["updateTime"] = order["time"] + 150
+        if i % 97 == 0:
+            # More significant digits than float64 holds
+            order["cumQuote"] = f"{random.randrange(10 ** 19)}.{random.randrange(10 ** 8):08d}"
+            # 16 significant digits, unsigned: just past what float64 keeps exactly
+            order["avgPrice"] = "9467779.982811493"
+        if i % 101 == 0:
+            order["priceMatch"] = None
+            order["stopPrice"] = None
+            order["goodTillDate"] = None
+        orders.append(order)
+        trades.append({
+            "symbol": order["symbol"], "orderId": order["orderId"], "id": i, "time": order["updateTime"],
+            "realizedPnl": f"{random.gauss(0, 20):.8f}", "commission": f"{random.uniform(0, 2):.8f}",
+            "commissionAsset": "USDT",
+        })
+    # Round-trip through JSON so every record owns its strings, like rows read from the store
+    return json.dumps(orders), json.dumps(trades)
+
+
+def dict_layout(orders, trades):
+    grouped = {}
+    for trade in trades:
+        grouped.setdefault((trade["symbol"], trade["orderId"]), []).append(trade)
+    for order in orders:
+        order["timeReadable"] = datetime.fromtimestamp(order["time"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        order["updateTimeReadable"] = datetime.fromtimestamp(order["updateTime"] / 1000).strftime('%Y-%m-%d %H:%M:%S')
+        order_trades = grouped.get((order["symbol"], order["orderId"]), [])
+        if order_trades:
+            order["realizedPnl"] = str(sum(float(t.get("realizedPnl", 0)) for t in order_trades))
+            order["commission"] = str(sum(float(t.get("commission", 0)) for t in order_trades))
+            order["commissionAsset"] = order_trades[0]["commissionAsset"]
+    orders.sort(key=lambda x: x["time"], reverse=True)
+    return orders
+
+
+def column_layout(orders, trades):
+    return OrderColumns.pack(orders, total_trades(trades))
+
+
+def retained(build, orders_json: str, trades_json: str):
+    """
+    Bytes still allocated once `build` returns and its input records are dropped.
+    """
+    gc.collect()
+    tracemalloc.start()
+    orders, trades = json.loads(orders_json), json.loads(trades_json)
+    result = build(orders, trades)
+    del orders, trades
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--symbols", type=int, default=50)
+    args = parser.parse_args()
+
+    orders_json, trades_json = make_history(args.orders, args.symbols)
+    print(f"{args.orders} orders, {args.symbols} symbols")
+
+    # CPU first, while the heap is small enough not to skew the timings
+    timings = {}
+    for label, build in (("dicts of strings", dict_layout), ("OrderColumns", column_layout)):
+        orders, trades = json.loads(orders_json), json.loads(trades_json)
+        start = time.process_time()
+        result = build(orders, trades)
+        timings[label] = time.process_time() - start
+    del orders, trades
+    start = time.process_time()
+    rendered = result.to_dicts()
+    render_time = time.process_time() - start
+    del rendered, result
+
+    print(f"  {'layout':<24}{'retained':>12}{'peak':>12}{'per order':>12}{'build':>10}")
+    results = {}
+    for label, build in (("dicts of strings", dict_layout), ("OrderColumns", column_layout)):
+        result, size, peak = retained(build, orders_json, trades_json)
+        results[label] = result
+        print(f"  {label:<24}{size / 2**20:9.1f} MiB{peak / 2**20:9.1f} MiB{size / args.orders:9.0f} B"
+              f"{timings[label] * 1000:7.0f} ms")
+    print(f"  OrderColumns.to_dicts: {render_time * 1000:.0f} ms")
+    assert results["OrderColumns"].to_dicts() == results["dicts of strings"], "OrderColumns output differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per-request CPU cost of serializing order-history and account payloads.
+
+Compares FastAPI's default response_model path (validate the returned dict, re-encode it with
+jsonable_encoder, then json.dumps) with app.responses.fast_json_response in trusted mode (cut
+down to the model's fields, then ujson) and validate-once mode.
+
+Usage: python -m benchmarks.serialization [--orders 5000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import copy
+import time
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app import responses
+from app.models.futures import FuturesAccountResponse, FuturesOrdersResponse
+
+
+def make_orders_payload(count: int) -> dict:
+    example = FuturesOrdersResponse.model_config["json_schema_extra"]["example"]["orders"][0]
+    orders = []
+    for i in range(count):
+        order = dict(example)
+        order["orderId"] = example["orderId"] + i
+        order["time"] = example["time"] - i * 60000
+        order["updateTime"] = order["time"]
+        orders.append(order)
+    return {"total_orders": count, "period": "Last 89 days", "orders": orders}
+
+
+def make_account_payload() -> dict:
+    return copy.deepcopy(FuturesAccountResponse.model_config["json_schema_extra"]["example"])
+
+
+def fastapi_default(model):
+    field = create_model_field("Response", model)
+    loop = asyncio.new_event_loop()
+
+    def render(payload):
+        content = loop.run_until_complete(serialize_response(field=field, response_content=payload))
+        return JSONResponse(content).body
+    return render
+
+
+def fast_path(model, validate: bool):
+    def render(payload):
+        responses.VALIDATE_RESPONSES = validate
+        return responses.fast_json_response(payload, model).body
+    return render
+
+
+def cpu_per_call(render, payload, repeat: int) -> float:
+    render(payload)
+    start = time.process_time()
+    for _ in range(repeat):
+        render(payload)
+    return (time.process_time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        (f"futures_get_all_orders ({args.orders} orders)", FuturesOrdersResponse, make_orders_payload(args.orders)),
+        ("get_futures_account", FuturesAccountResponse, make_account_payload()),
+    ]
+    for name, model, payload in cases:
+        repeat = args.repeat if model is FuturesOrdersResponse else args.repeat * 100
+        baseline = cpu_per_call(fastapi_default(model), payload, repeat)
+        print(name)
+        print(f"  {'response_model (default)':<28}{baseline:10.3f} ms")
+        for label, validate in (("fast path, trusted", False), ("fast path, validate once", True)):
+            elapsed = cpu_per_call(fast_path(model, validate), payload, repeat)
+            print(f"  {label:<28}{elapsed:10.3f} ms  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,10 @@ COMMIT_MESSAGE=$1
 SERVER_IP="18.142.57.169"
 PROJECT_PATH="/home/ubuntu/trading_dashboard"
 SSH_KEY_PATH="../LightsailDefaultKey-ap-southeast-1.pem"
+# Uvicorn worker processes; with more than one, workers share caches and the Binance weight budget,
+# order history is synced once per node into the order store (data/orders), and /metrics reports one
+# worker per scrape (samples carry a pid label)
+WORKERS=${WORKERS:-1}
 LOCAL_FILES=(
   # "./.keys"
 #  "/path/to/your/local/file2"
@@ -43,9 +47,17 @@ done
 ssh -i $SSH_KEY_PATH ubuntu@$SERVER_IP "pkill -f 'uvicorn trading_dashboard:app'"
 
 # Step 6: Start the new FastAPI service using venv Python
-ssh -i $SSH_KEY_PATH ubuntu@$SERVER_IP "cd $PROJECT_PATH && source venv/bin/activate && nohup uvicorn trading_dashboard:app --host 0.0.0.0 --port 8000 > app.log 2>&1 &"
+if [ "$WORKERS" -gt 1 ]; then
+  SERVICE_ENV="SHARED_CACHE_ENABLED=true ORDER_STORE_ENABLED=true"
+else
+  SERVICE_ENV=""
+fi
+ssh -i $SSH_KEY_PATH ubuntu@$SERVER_IP "cd $PROJECT_PATH && source venv/bin/activate && $SERVICE_ENV nohup uvicorn trading_dashboard:app --host 0.0.0.0 --port 8000 --workers $WORKERS > app.log 2>&1 &"
 
 # Step 7: Verify the service is running
 ssh -i $SSH_KEY_PATH ubuntu@$SERVER_IP "ps aux | grep uvicorn"
 
+# Step 8: Wait for the service to finish warming up (/ready answers 200)
+ssh -i $SSH_KEY_PATH ubuntu@$SERVER_IP "for i in \$(seq 1 60); do curl -sf http://127.0.0.1:8000/ready && exit 0; sleep 1; done; echo 'Service did not become ready'"
+
 echo "Deployment completed! FastAPI service has been restarted."
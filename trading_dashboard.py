@@ -1,15 +1,48 @@
-from fastapi import FastAPI, Header
+import asyncio
+import ujson
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
-from typing import Optional
-from app.models.futures import FuturesAccountResponse, FuturesOrdersResponse
+from typing import List, Optional
+from app.models.futures import FuturesAccountResponse, FuturesOrder, FuturesOrdersResponse, LeverageChange, PortfolioAccount
+from app.compression import CompressionMiddleware
+from app.responses import fast_json_response, model_fields_only, not_modified_response
+from app.services.account_stream import filter_account, get_account_streams
 from app.services.binance import BinanceService
+from app.services.client_pool import get_client_pool
+from app.services.exchange_info import get_exchange_info_cache
+from app.services.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics, sample_payload
+from app.services.order_store import close_order_stores
+from app.services.rate_limit import get_scheduler
+from app.services.shared_cache import close_shared_cache
+from app.services.warmup import get_warmup
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Seconds without account changes before a push connection gets a keepalive ping
+PUSH_PING_INTERVAL = 30
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so the port opens right away; /ready reports when it is done
+    get_warmup().start()
+    get_account_streams().start()
+    get_client_pool().start()
+    yield
+    await get_warmup().stop()
+    await get_account_streams().close_all()
+    from app.services.live_pnl import get_live_pnl
+    await get_live_pnl().stop()
+    await get_exchange_info_cache().stop()
+    await get_client_pool().close_all()
+    close_order_stores()
+    close_shared_cache()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,10 +53,45 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Brotli/gzip for large JSON payloads; added before the metrics middleware so its time is measured
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency histograms, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/get_my_name")
 async def get_my_name():
     return {"name": "SonPH"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 503 until start-up warm-up (imports, exchange info, stored accounts) has
+    finished, then 200. Each warm-up step's status is reported either way.
+    """
+    warmup = get_warmup()
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+@app.get("/upstream_rate_limit")
+async def upstream_rate_limit():
+    """
+    Current Binance request-weight budget and the number of upstream calls queued by priority.
+    """
+    return get_scheduler().stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics: route and Binance call latency, history windows per request, cache hit
+    rates and request-weight usage.
+
+    Metrics are kept per worker process and every sample carries a `pid` label. With WORKERS > 1
+    each scrape is answered by whichever worker accepts it, so a worker's series are only updated
+    when it is the one scraped: aggregate across pids with rate()/sum() rather than reading raw
+    counters, or run one worker when exact per-scrape totals are needed.
+    """
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
 @app.get("/get_futures_account", response_model=FuturesAccountResponse)
 async def get_futures_account(
     x_api_key: str = Header(..., description="Binance API Key"),
@@ -33,10 +101,92 @@ async def get_futures_account(
     Get Binance futures account information using API credentials.
     """
     try:
-        return BinanceService.get_futures_account(x_api_key, x_api_secret)
+        result = await BinanceService.get_futures_account(x_api_key, x_api_secret)
+        return fast_json_response(result, FuturesAccountResponse)
+    except Exception as e:
+        return fast_json_response({"error": str(e)}, FuturesAccountResponse)
+
+@app.post("/futures_portfolio")
+async def futures_portfolio(accounts: List[PortfolioAccount]):
+    """
+    Combined balances and netted positions across several futures accounts, fetched concurrently.
+    
+    Parameters:
+    - **accounts**: JSON body, list of accounts, each {"api_key": "...", "api_secret": "..."}; an
+      optional "label" names the account in the response
+    
+    Returns:
+    - **succeeded** / **failed**: Number of accounts fetched / failed
+    - **totals**: Account totals (wallet balance, unrealized PnL, margin balance, ...) summed
+    - **assets**: Balances per asset, summed across accounts
+    - **exposure**: Per symbol, largest first: net, long and short quantity, net and gross notional,
+      unrealized PnL, margin, and the accounts holding it
+    - **accounts**: Per account, in request order: headline balances and position count, or the error
+    """
+    try:
+        return await BinanceService.get_portfolio(accounts)
     except Exception as e:
+        print(f"Error in futures_portfolio: {str(e)}")  # Add error logging
         return {"error": str(e)}
 
+@app.get("/futures_live_pnl")
+async def futures_live_pnl(
+    x_api_key: str = Header(..., description="Binance API Key"),
+    x_api_secret: str = Header(..., description="Binance API Secret")
+):
+    """
+    Live PnL for open positions, recomputed on every mark-price tick.
+
+    Returns, for each open position:
+    - **markPrice**: Latest mark price from the shared mark-price stream
+    - **unrealizedProfit**: Unrealized PnL at that mark price
+    - **roe**: Unrealized PnL over the position's initial margin
+    - **liquidationDistance**: Estimated fraction the mark price can move against the position
+      before its margin buffer is exhausted, assuming other positions stay flat
+    """
+    try:
+        return await BinanceService.get_live_pnl(x_api_key, x_api_secret)
+    except Exception as e:
+        print(f"Error in futures_live_pnl: {str(e)}")  # Add error logging
+        return {"error": str(e)}
+
+@app.websocket("/ws/futures_account")
+async def futures_account_ws(websocket: WebSocket):
+    """
+    Push futures account changes instead of polling /get_futures_account.
+
+    Browsers cannot set headers on a WebSocket, so the first message from the client must be
+    {"api_key": "...", "api_secret": "..."}. The server then sends:
+    - {"type": "snapshot", "account": {...}}: the full account, first and after falling behind
+    - {"type": "delta", "account": {...}, "assets": [...], "positions": [...],
+       "removedAssets": [...], "removedPositions": [...]}: only what changed
+    - {"type": "fill", "fill": {...}}: each new trade fill
+    - {"type": "ping"}: keepalive when nothing changed for a while
+
+    All connections for the same credentials share one upstream user-data stream.
+    """
+    await websocket.accept()
+    try:
+        credentials = await websocket.receive_json()
+        stream = await get_account_streams().get(credentials["api_key"], credentials["api_secret"])
+        queue = stream.subscribe()
+        try:
+            await websocket.send_json({"type": "snapshot", "account": filter_account(await stream.snapshot())})
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), PUSH_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    message = {"type": "ping"}
+                await websocket.send_json(message)
+        finally:
+            stream.unsubscribe(queue)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Error in futures_account_ws: {str(e)}")  # Add error logging
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close()
+
 @app.post("/futures_change_position_mode")
 async def futures_change_position_mode(
     mode: bool,
@@ -45,7 +195,7 @@ async def futures_change_position_mode(
 ):
     """Change position mode between Hedge Mode (true) and One-way Mode (false)"""
     try:
-        BinanceService.change_position_mode(x_api_key, x_api_secret, mode)
+        await BinanceService.change_position_mode(x_api_key, x_api_secret, mode)
         return {"message": f"Hedge mode changed to {mode}"}
     except Exception as e:
         return {"error": str(e)}
@@ -57,25 +207,46 @@ async def futures_get_position_mode(
 ):
     """Get current position mode"""
     try:
-        return BinanceService.get_position_mode(x_api_key, x_api_secret)
+        return await BinanceService.get_position_mode(x_api_key, x_api_secret)
     except Exception as e:
         return {"error": str(e)}
 
+async def stream_orders_ndjson(api_key: str, api_secret: str, symbol: Optional[str], days: int,
+                               since: Optional[int] = None):
+    try:
+        # One chunk per batch: every chunk is a separate send, and a compression flush
+        async for orders in BinanceService.stream_all_orders(api_key, api_secret, symbol, days, since=since):
+            yield "".join([ujson.dumps(model_fields_only(order, FuturesOrder)) + "\n" for order in orders])
+    except Exception as e:
+        # Headers are already sent, so report the failure as the final record
+        print(f"Error in futures_get_all_orders stream: {str(e)}")
+        yield ujson.dumps({"error": str(e), "detail": "Internal server error occurred"}) + "\n"
+
 @app.get("/futures_get_all_orders", response_model=FuturesOrdersResponse)
 async def futures_get_all_orders(
     x_api_key: str = Header(..., description="Binance API Key"),
     x_api_secret: str = Header(..., description="Binance API Secret"),
     symbol: Optional[str] = None,
-    days: Optional[int] = 89
+    days: Optional[int] = 89,
+    stream: Optional[str] = None,
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None, description="ETag of a previous response")
 ):
     """
     Get all futures orders for a given period.
+
+    Responses carry an ETag based on the order count and latest update time. Send it back as
+    If-None-Match and an unchanged history is answered with an empty 304.
     
     Parameters:
     - **x_api_key**: Your Binance API key (required)
     - **x_api_secret**: Your Binance API secret (required)
     - **symbol**: Trading pair symbol (e.g., 'BTCUSDT'). If not provided, returns orders for all symbols
-    - **days**: Number of days to look back (default: 90, max: 90)
+    - **days**: Number of days to look back (default: 89, max: 90 unless the local order store is enabled)
+    - **stream**: Set to 'ndjson' to stream orders newest first, one JSON object per line, as each
+                  history window is fetched instead of waiting for the full response
+    - **since**: Only return orders updated after this timestamp (ms), e.g. the latest updateTime
+                 already seen, for incremental polling
     
     Returns:
     - **total_orders**: Total number of orders in the response
@@ -92,13 +263,60 @@ async def futures_get_all_orders(
         - commission: Trading fee
         - and more order details
     """
+    if stream == "ndjson":
+        return StreamingResponse(
+            stream_orders_ndjson(x_api_key, x_api_secret, symbol, days, since),
+            media_type="application/x-ndjson"
+        )
+    if stream is not None:
+        return fast_json_response(
+            {"error": f"Unsupported stream format: {stream}", "detail": "Supported formats: ndjson"},
+            FuturesOrdersResponse
+        )
+
     try:
-        result = BinanceService.get_all_orders(x_api_key, x_api_secret, symbol, days)
-        print(f"API Response: {result}")  # Add logging to debug
-        return result
+        etag, result = await BinanceService.get_all_orders(
+            x_api_key, x_api_secret, symbol, days, since=since, if_none_match=if_none_match
+        )
+        if result is None:
+            return not_modified_response(etag)
+        sample_payload("futures_get_all_orders", result)
+        # Encoding a long history takes a while; keep it off the event loop
+        response = await BinanceService.run_sync(fast_json_response, result, FuturesOrdersResponse)
+        if etag is not None:
+            response.headers["ETag"] = etag
+        return response
     except Exception as e:
         print(f"Error in futures_get_all_orders: {str(e)}")  # Add error logging
-        return {"error": str(e), "detail": "Internal server error occurred"}
+        return fast_json_response({"error": str(e), "detail": "Internal server error occurred"}, FuturesOrdersResponse)
+
+@app.get("/futures_trade_analytics")
+async def futures_trade_analytics(
+    x_api_key: str = Header(..., description="Binance API Key"),
+    x_api_secret: str = Header(..., description="Binance API Secret"),
+    symbol: Optional[str] = None,
+    days: int = 89
+):
+    """
+    Get trading performance analytics computed from futures fill history.
+    
+    Parameters:
+    - **x_api_key**: Your Binance API key (required)
+    - **x_api_secret**: Your Binance API secret (required)
+    - **symbol**: Trading pair symbol (e.g., 'BTCUSDT'). If not provided, covers all traded symbols
+    - **days**: Number of days to look back (default: 89)
+    
+    Returns:
+    - **summary**: Totals for the period: fills, volume, realized PnL, fees, net PnL, win rate, profit factor
+    - **bySymbol** / **bySide**: The same aggregates per symbol and per order side
+    - **daily**: Per-day (UTC) aggregates as columns, with the closing equity and drawdown of each day
+    - **drawdown**: Maximum drawdown of cumulative net PnL, when it peaked and bottomed out
+    """
+    try:
+        return await BinanceService.get_trade_analytics(x_api_key, x_api_secret, symbol, days)
+    except Exception as e:
+        print(f"Error in futures_trade_analytics: {str(e)}")  # Add error logging
+        return {"error": str(e)}
 
 @app.post("/futures_change_leverage")
 async def futures_change_leverage(
@@ -120,11 +338,36 @@ async def futures_change_leverage(
     - Response from Binance API with updated leverage information
     """
     try:
-        return BinanceService.change_leverage(x_api_key, x_api_secret, symbol, leverage)
+        return await BinanceService.change_leverage(x_api_key, x_api_secret, symbol, leverage)
     except Exception as e:
         print(f"Error in futures_change_leverage: {str(e)}")  # Add error logging
         return {"error": str(e)}
 
+@app.post("/futures_change_leverage_batch")
+async def futures_change_leverage_batch(
+    changes: List[LeverageChange],
+    x_api_key: str = Header(..., description="Binance API Key"),
+    x_api_secret: str = Header(..., description="Binance API Secret")
+):
+    """
+    Change leverage for several symbols in one request.
+    
+    Parameters:
+    - **changes**: JSON body, list of {"symbol": "BTCUSDT", "leverage": 10} (leverage 1-125, each symbol once)
+    - **x_api_key**: Your Binance API key (required)
+    - **x_api_secret**: Your Binance API secret (required)
+    
+    Returns:
+    - **succeeded** / **failed**: Number of symbols changed / rejected
+    - **results**: One entry per requested change, in request order: either the updated
+      symbol, leverage and maxNotionalValue, or the symbol and an error message
+    """
+    try:
+        return await BinanceService.change_leverage_batch(x_api_key, x_api_secret, changes)
+    except Exception as e:
+        print(f"Error in futures_change_leverage_batch: {str(e)}")  # Add error logging
+        return {"error": str(e)}
+
 @app.get("/futures_get_leverage_brackets")
 async def futures_get_leverage_brackets(
     x_api_key: str = Header(..., description="Binance API Key"),
@@ -148,11 +391,39 @@ async def futures_get_leverage_brackets(
         - Maintenance margin requirements
     """
     try:
-        return BinanceService.get_leverage_brackets(x_api_key, x_api_secret, symbols)
+        return await BinanceService.get_leverage_brackets(x_api_key, x_api_secret, symbols)
     except Exception as e:
         print(f"Error in futures_get_leverage_brackets: {str(e)}")  # Add error logging
         return {"error": str(e)}
 
+@app.get("/futures_get_margin_requirements")
+async def futures_get_margin_requirements(
+    symbol: str,
+    notional: float,
+    x_api_key: str = Header(..., description="Binance API Key"),
+    x_api_secret: str = Header(..., description="Binance API Secret")
+):
+    """
+    Get max leverage and maintenance margin for a position size, from the cached bracket tables.
+    
+    Parameters:
+    - **symbol**: Trading pair symbol (e.g., 'BTCUSDT')
+    - **notional**: Position notional value in the quote asset
+    - **x_api_key**: Your Binance API key (required)
+    - **x_api_secret**: Your Binance API secret (required)
+    
+    Returns:
+    - **bracket**: Bracket number the notional falls into
+    - **maxLeverage**: Maximum leverage allowed at this notional
+    - **maintMarginRatio**: Maintenance margin rate
+    - **maintMargin**: Maintenance margin required (notional * rate - bracket maintenance amount)
+    """
+    try:
+        return await BinanceService.get_margin_requirements(x_api_key, x_api_secret, symbol, notional)
+    except Exception as e:
+        print(f"Error in futures_get_margin_requirements: {str(e)}")  # Add error logging
+        return {"error": str(e)}
+
 @app.get("/futures_get_leverage")
 async def futures_get_leverage(
     x_api_key: str = Header(..., description="Binance API Key"),
@@ -172,7 +443,7 @@ async def futures_get_leverage(
     - Dictionary containing current leverage settings for each symbol
     """
     try:
-        return BinanceService.get_leverage(x_api_key, x_api_secret, symbols)
+        return await BinanceService.get_leverage(x_api_key, x_api_secret, symbols)
     except Exception as e:
         error_message = str(e)
         print(f"Error in futures_get_leverage: {error_message}")  # Add error logging